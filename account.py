@@ -1,5 +1,4 @@
 import tkinter as tk
-from accounts import SavingsAccount
 
 class AccountItem(tk.Frame):
     """Graphics for the account item."""
@@ -12,21 +11,21 @@ class AccountItem(tk.Frame):
         self.create_widgets()
 
     def create_widgets(self):
-        text = f"ID: {self.format()}\nBalance: ${self._account.get_balance():.2f}"
+        text = f"ID: {self.format()}\nBalance: ${self._account.balance:.2f}"
         
-        # Check Polymorphism
-        account_type = "Savings" if isinstance(self._account, SavingsAccount) else "Checkings"
+        # Account is an AccountSnapshot, so the type comes from the stored discriminator
+        account_type = "Savings" if self._account.account_type == "savings" else "Checkings"
         text += f"\n{account_type}"
 
-        label = tk.Radiobutton(self, text=text, value=self._account.id, compound="top", padx=5, justify="left")
+        label = tk.Radiobutton(self, text=text, value=self._account.account_number, compound="top", padx=5, justify="left")
         label.pack(anchor="w", pady=3)
         label.bind("<Button-1>", self.handle_select)
 
     def handle_select(self, event):
-        self._select_callback(self._account.id)
+        self._select_callback(self._account.account_number)
 
     def format(self):
         """Formats the account number and balance of the account.
         For example, '#000000001,<tab>balance: $50.00'
         """
-        return f"#{self._account.id:09}"
+        return f"#{self._account.account_number:09}"
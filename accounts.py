@@ -1,12 +1,17 @@
 import logging
+from datetime import date
 from decimal import Decimal
 
-from transactions import Transaction
+from transactions import Transaction, PeriodClose, ArchivedTransaction
+from balance_index import BalanceIndex
+from cache import account_cache, AccountSnapshot
+from policies import apply_product, compile_policy
 from exceptions import *
 
 from db import dataBase
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, select, func, inspect
+from sqlalchemy.orm import relationship, object_session
+from sqlalchemy.orm.attributes import set_committed_value
 
 from decimal import Decimal
 
@@ -21,12 +26,12 @@ class Account(dataBase):
     _account_number = Column(Integer, unique=True, primary_key=True)
     _bank_id = Column(Integer, ForeignKey("banks._id"))
     _account_type = Column(String)
-    _balance = Column(Float, default=0.0)
-    _interest_rate = Column(Float)
-    _daily_limit = Column(Float, default=float('inf'))
-    _monthly_limit = Column(Float, default=float('inf'))
+    _balance = Column(Float(asdecimal=True), default=0.0)
+    _interest_rate = Column(Float(asdecimal=True))
+    _daily_limit = Column(Float(asdecimal=True), default=float('inf'))
+    _monthly_limit = Column(Float(asdecimal=True), default=float('inf'))
     _balance_threshold = Column(Integer, default=None)
-    _low_balance_fee = Column(Float, default=-5.44)
+    _low_balance_fee = Column(Float(asdecimal=True), default=-5.44)
 
     # Define Polymorphism
     __mapper_args__ = {
@@ -36,11 +41,17 @@ class Account(dataBase):
 
     # Relationships
     bank = relationship("Bank", back_populates="_accounts")
-    _transactions = relationship("Transaction")
+    _transactions = relationship("Transaction", order_by="Transaction._id")
     
 
-    def __init__(self, acct_num):
+    # product applied when no other product is given; set by the concrete account classes
+    _default_product = None
+
+    def __init__(self, acct_num, product=None):
         self._account_number = acct_num
+        product = product or self._default_product
+        if product is not None:
+            apply_product(self, product)
         logging.debug(f"Created account: {self._account_number}")
 
 
@@ -56,6 +67,9 @@ class Account(dataBase):
             amt (Decimal): amount for new transaction
             date (Date): Date for the new transaction.
             exempt (bool, optional): Determines whether the transaction is exempt from account limits. Defaults to False.
+
+        Returns:
+            Transaction: the transaction that was added
         """
 
         t = Transaction(amt,
@@ -68,7 +82,13 @@ class Account(dataBase):
             self._check_limits(t)
             self._check_date(t)
 
-        self._transactions.append(t)
+        if self._history_loaded():
+            self._transactions.append(t)
+            self._index_transaction(t)
+        else:
+            # leave the history unloaded; it and the balance index include t once it is flushed
+            t._account_id = self._account_number
+        account_cache.invalidate(self._account_number)
 
         try:
             session.add(t)
@@ -76,6 +96,8 @@ class Account(dataBase):
         except Exception as e:
             logging.error(f"Error adding transaction to session: {e}")
 
+        return t
+
     def _check_balance(self, t):
         """Checks whether an incoming transaction would overdraw the account
 
@@ -88,14 +110,56 @@ class Account(dataBase):
         if not t.check_balance(self.get_balance()):
             raise OverdrawError()
 
+    def _policy(self):
+        "Returns the compiled rules for this account's product values"
+        return compile_policy(self._interest_rate, self._daily_limit, self._monthly_limit,
+                              self._balance_threshold, self._low_balance_fee)
+
     def _check_limits(self, t):
-        pass
+        transactions = self._transactions if self._history_loaded() else self._stored_in_month(t)
+        self._policy().check_limits(transactions, t)
 
     def _check_date(self, t):
-        if len(self._transactions) > 0:
-            latest_transaction = max(self._transactions)
-            if t < latest_transaction:
-                raise TransactionSequenceError(latest_transaction.date)
+        latest_date = self._latest_date()
+        if latest_date is not None and t.date < latest_date:
+            raise TransactionSequenceError(latest_date)
+
+    def _history_loaded(self):
+        """False for a stored account loaded without its transactions, e.g. with the account_only()
+        profile in loading.py. Posting then asks the database for the balance, the latest date and
+        the current month's transactions instead of loading the whole history.
+        """
+        state = inspect(self)
+        return not (state.persistent and "_transactions" in state.unloaded)
+
+    def _history(self):
+        "Returns every transaction of this account, loading them in one query if they are not loaded yet"
+        if not self._history_loaded():
+            transactions = object_session(self).scalars(self._stored(Transaction).order_by(Transaction._id)).all()
+            set_committed_value(self, "_transactions", transactions)
+        return self._transactions
+
+    def _stored(self, *columns):
+        "Returns a select of the given columns over this account's transactions in the database"
+        return select(*columns).where(Transaction._account_id == self._account_number)
+
+    def _stored_in_month(self, t):
+        "Yields the stored transactions in the month of t; nothing is queried unless the limits are checked"
+        first = date(t.date.year, t.date.month, 1)
+        yield from object_session(self).scalars(
+            self._stored(Transaction).where(Transaction._date >= first, Transaction._date <= t.last_day_of_month()))
+
+    def _latest_date(self):
+        "Returns the date of the newest transaction, or None if there are none"
+        if self._history_loaded():
+            return max(self._transactions).date if self._transactions else None
+        return object_session(self).scalar(self._stored(func.max(Transaction._date)))
+
+    def _latest_id(self):
+        "Returns the id of the newest stored transaction, or None if there are none"
+        if self._history_loaded():
+            return max((t._id for t in self._transactions if t._id is not None), default=None)
+        return object_session(self).scalar(self._stored(func.max(Transaction._id)))
 
     def get_balance(self):
         """Gets the balance for an account by summing its transactions
@@ -107,19 +171,119 @@ class Account(dataBase):
         # but this is more foolproof since it's always in sync with transactions
         # this could be improved by caching the sum to avoid too much
         # recalculation, while still maintaining the list as the ground truth
-        return sum(self._transactions)
+        if self._history_loaded():
+            return sum(self._transactions)
+        # summed here in id order rather than with SQL SUM, which adds floats: the loaded branch
+        # adds Decimals one at a time in the current context, and both must give the same balance
+        return sum(object_session(self).scalars(self._stored(Transaction._amt).order_by(Transaction._id)))
+
+    def _get_balance_index(self):
+        """Returns the prefix-sum index for this account, rebuilding it if it no longer matches the transactions.
+        The index is not a mapped column, so it is created lazily for accounts loaded from the database,
+        and it outlives commits, which only expire the transaction list; see _catch_up.
+        """
+        index = getattr(self, "_balance_index", None)
+        if self._history_loaded():
+            if index is not None and len(index) == len(self._transactions):
+                return index
+        elif index is not None and self._catch_up(index):
+            return index
+        index = BalanceIndex(self._history(), *self._archive())
+        self._balance_index = index
+        return index
+
+    def _catch_up(self, index):
+        """Checks an index against the database while the transaction list is unloaded, in one query
+        for the number of stored transactions, the newest id and the number of period closes.
+        Transactions stored since the index was built are appended to it.
+
+        Returns:
+            bool: False if the index has to be rebuilt from the full history
+        """
+        session = object_session(self)
+        closes = (select(func.count()).select_from(PeriodClose)
+                  .where(PeriodClose._account_id == self._account_number).scalar_subquery())
+        count, last_id, num_closes = session.execute(
+            self._stored(func.count(), func.max(Transaction._id), closes)).one()
+
+        # ids are only known once the transactions are flushed; identity does not load expired objects
+        identity = inspect(index.newest).identity if index.newest is not None else None
+        indexed_id = identity[0] if identity else None
+        if num_closes != index.closes or (indexed_id is None and len(index)):
+            return False
+        if (count, last_id) == (len(index), indexed_id):
+            return True
+
+        added = session.scalars(self._stored(Transaction)
+                                .where(Transaction._id > (indexed_id or 0))
+                                .order_by(Transaction._id)).all()
+        if len(index) + len(added) != count:
+            return False
+        for t in added:
+            if not index.can_append(t):
+                return False
+            index.append(t)
+        return True
+
+    def _archive(self):
+        """Returns the transactions period closes moved out of this account and the ids of the opening
+        entries that replaced them, so balances before a close still add up the original transactions.
+        """
+        if not inspect(self).persistent:
+            return (), set()
+        session = object_session(self)
+        openings = set(session.scalars(select(PeriodClose._opening_id)
+                                       .where(PeriodClose._account_id == self._account_number)))
+        if not openings:
+            return (), openings
+        # opening entries of earlier closes that were archived again are left out like the live ones
+        archived = session.scalars(select(ArchivedTransaction)
+                                   .where(ArchivedTransaction._account_id == self._account_number,
+                                          ArchivedTransaction._carried_forward.is_(False))).all()
+        return archived, openings
+
+    def _index_transaction(self, t):
+        "Appends a newly added transaction to the index, or drops the index if it would be out of order"
+        index = getattr(self, "_balance_index", None)
+        if index is None:
+            return
+        if len(index) == len(self._transactions) - 1 and index.can_append(t):
+            index.append(t)
+        else:
+            self._balance_index = None
+
+    def get_balance_as_of(self, day):
+        """Gets the balance for an account at the end of the given day.
+
+        Args:
+            day (Date): last day to include in the balance
+
+        Returns:
+            Decimal: balance of all transactions dated on or before the given day
+        """
+        return self._get_balance_index().balance_as_of(day)
+
+    def get_net_flow(self, start, end):
+        """Gets the net amount moved in or out of the account between two dates.
+
+        Args:
+            start (Date): first day of the range, inclusive
+            end (Date): last day of the range, inclusive
+
+        Returns:
+            Decimal: sum of all transactions dated within the range
+        """
+        return self._get_balance_index().net_flow(start, end)
 
     def _assess_interest(self, latest_transaction, session):
         """Calculates interest for an account balance and adds it as a new transaction exempt from limits.
         """
-        self.add_transaction(self.get_balance() * self._interest_rate, 
-                        date=latest_transaction.last_day_of_month(), 
-                        session=session,
-                        exempt=True)
-        
+        self._policy().assess_interest(self, latest_transaction, session)
 
     def _assess_fees(self, latest_transaction, session):
-        pass
+        """Adds a low balance fee if the account's product defines one and the balance is below its threshold.
+        """
+        self._policy().assess_fees(self, latest_transaction, session)
 
     def assess_interest_and_fees(self, session):
         """Used to apply interest and/or fees for this account
@@ -128,14 +292,29 @@ class Account(dataBase):
             TransactionSequenceError: Indicates that the new transactions were
             not newer than the most recent interest or fees transactions
         """
-        latest_transaction = max(self._transactions)
-        for t in self._transactions:
-            if t.is_exempt() and t.in_same_month(latest_transaction):
-                # found an interest or fee transaction that is already in the
-                # same month as the most recent transaction
-                raise TransactionSequenceError(t.date)
+        if self._history_loaded():
+            latest_transaction = max(self._transactions)
+            for t in self._transactions:
+                if t.is_exempt() and t.in_same_month(latest_transaction):
+                    # found an interest or fee transaction that is already in the
+                    # same month as the most recent transaction
+                    raise TransactionSequenceError(t.date)
+        else:
+            session = object_session(self)
+            latest_transaction = session.scalars(self._stored(Transaction).order_by(Transaction._date.desc())
+                                                 .limit(1)).first()
+            if latest_transaction is None:
+                raise ValueError("No transactions to assess interest and fees on.")
+            first = date(latest_transaction.date.year, latest_transaction.date.month, 1)
+            assessed = session.scalar(self._stored(Transaction._date)
+                                      .where(Transaction._exempt.is_(True), Transaction._date >= first,
+                                             Transaction._date <= latest_transaction.last_day_of_month())
+                                      .order_by(Transaction._id).limit(1))
+            if assessed is not None:
+                raise TransactionSequenceError(assessed)
         self._assess_interest(latest_transaction, session)
         self._assess_fees(latest_transaction, session)
+        account_cache.invalidate(self._account_number)
 
     def __str__(self):
         """Formats the account number and balance of the account.
@@ -143,9 +322,28 @@ class Account(dataBase):
         """
         return f"#{self._account_number:09},\tbalance: ${self.get_balance():,.2f}"
 
+    def snapshot(self, totals=None):
+        """Returns an AccountSnapshot with the current type, balance, limits and latest transaction date and id
+
+        Args:
+            totals (tuple, optional): balance, latest date and latest id already queried for many accounts
+                at once, see loading.account_totals
+        """
+        if totals is None:
+            totals = (self.get_balance(), self._latest_date(), self._latest_id())
+        balance, last_date, last_id = totals
+        return AccountSnapshot(self._account_number,
+                               self._account_type,
+                               balance,
+                               self._interest_rate,
+                               self._daily_limit,
+                               self._monthly_limit,
+                               last_date,
+                               last_id)
+
     def get_transactions(self):
         "Returns sorted list of transactions on this account"
-        return sorted(self._transactions)
+        return sorted(self._history())
     
     @property
     def id(self):
@@ -155,6 +353,7 @@ class Account(dataBase):
 
 class SavingsAccount(Account):
     """Concrete Account class with daily and monthly account limits and high interest rate.
+    The limits and rate come from the account's product, see policies.py.
     """
 
     # Inheritance 
@@ -162,32 +361,7 @@ class SavingsAccount(Account):
         'polymorphic_identity': 'savings'
     }
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._interest_rate = Decimal("0.0041")
-        self._daily_limit = 2
-        self._monthly_limit = 5
-
-    def _check_limits(self, t1):
-        """determines if the incoming trasaction is within the accounts transaction limits
-
-        Args:
-            t1 (Transaction): pending transaction to be checked
-
-        Returns:
-            bool: true if within limits and false if beyond limits
-        """
-        # Count number of non-exempt transactions on the same day as t1
-        num_today = len(
-            [t2 for t2 in self._transactions if not t2.is_exempt() and t2.in_same_day(t1)])
-        # Count number of non-exempt transactions in the same month as t1
-        num_this_month = len(
-            [t2 for t2 in self._transactions if not t2.is_exempt() and t2.in_same_month(t1)])
-        # check counts against daily and monthly limits
-        if num_today >= self._daily_limit:
-            raise TransactionLimitError("day", self._daily_limit)
-        if num_this_month >= self._monthly_limit:
-            raise TransactionLimitError("month", self._monthly_limit)
+    _default_product = "savings"
 
     def __str__(self):
         """Formats the type, account number, and balance of the account.
@@ -198,6 +372,7 @@ class SavingsAccount(Account):
 
 class CheckingAccount(Account):
     """Concrete Account class with lower interest rate and low balance fees.
+    The fee, threshold and rate come from the account's product, see policies.py.
     """
 
     # Inheritance
@@ -205,20 +380,7 @@ class CheckingAccount(Account):
         'polymorphic_identity': 'checking'
     }
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._interest_rate = Decimal("0.0008")
-        self._balance_threshold = 100
-        self._low_balance_fee = Decimal("-5.44")
-
-    def _assess_fees(self, latest_transaction, session):
-        """Adds a low balance fee if balance is below a particular threshold. Fee amount and balance threshold are defined on the CheckingAccount.
-        """
-        if self.get_balance() < self._balance_threshold:
-            self.add_transaction(self._low_balance_fee,
-                                 date=latest_transaction.last_day_of_month(), 
-                                 session=session,
-                                 exempt=True)
+    _default_product = "checking"
 
     def __str__(self):
         """Formats the type, account number, and balance of the account.
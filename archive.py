@@ -0,0 +1,137 @@
+import argparse
+import logging
+from datetime import date, datetime
+
+from sqlalchemy import create_engine, select, insert, delete, func, literal
+
+from db import dataBase, create_indexes
+import bank  # registers the Bank mapping that Account refers to
+from accounts import Account
+from transactions import Transaction, PeriodClose, ArchivedTransaction
+from cache import account_cache
+
+
+def _close_account(connection, account_num, cutoff, today):
+    """Archives one account's transactions dated before the cutoff and carries their sum forward.
+
+    The account's latest month is never archived, so the sequence, limit and interest checks on
+    the live transactions see exactly the rows they would have seen before the close.
+
+    Returns:
+        int: number of transactions archived
+    """
+    transactions = Transaction.__table__
+    archived = ArchivedTransaction.__table__
+    closes = PeriodClose.__table__
+
+    latest = connection.execute(select(func.max(transactions.c._date))
+                                .where(transactions.c._account_id == account_num)).scalar()
+    if latest is None:
+        return 0
+    cutoff = min(cutoff, date(latest.year, latest.month, 1))
+
+    old = transactions.c._account_id == account_num, transactions.c._date < cutoff
+    count, total, last_id, last_date = connection.execute(
+        select(func.count(), func.sum(transactions.c._amt), func.max(transactions.c._id), func.max(transactions.c._date))
+        .where(*old)).one()
+    openings = select(closes.c._opening_id).where(closes.c._account_id == account_num)
+    if count == 0 or (count == 1 and connection.execute(
+            select(func.count()).where(transactions.c._id.in_(openings), *old)).scalar()):
+        # nothing before the cutoff, or only the opening entry from an earlier close
+        return 0
+
+    close_id = connection.execute(insert(closes).values(_account_id=account_num, _cutoff=cutoff,
+                                                        _opening_id=last_id, _archived=count,
+                                                        _closed_on=today)).inserted_primary_key[0]
+    earlier_openings = openings.where(closes.c._id != close_id)
+    connection.execute(insert(archived).from_select(
+        ["_id", "_close_id", "_account_id", "_amt", "_date", "_exempt", "_carried_forward"],
+        select(transactions.c._id, literal(close_id), transactions.c._account_id, transactions.c._amt,
+               transactions.c._date, transactions.c._exempt, transactions.c._id.in_(earlier_openings))
+        .where(*old)))
+    connection.execute(delete(transactions).where(*old))
+
+    # The opening entry reuses the id of the newest archived transaction so it still sorts
+    # before every live transaction, and is exempt so it never counts toward limits
+    connection.execute(insert(transactions).values(_id=last_id, _account_id=account_num, _amt=total,
+                                                   _date=last_date, _exempt=True))
+    return count
+
+
+def close_period(engine, cutoff):
+    """Moves every transaction dated before the cutoff month into the archive, leaving a single
+    carried-forward opening balance entry per account. Each account is closed in its own
+    database transaction so memory and lock time stay bounded.
+
+    Args:
+        engine (Engine): engine for the bank database
+        cutoff (Date): transactions before the first day of this month are archived
+
+    Returns:
+        tuple: number of accounts closed and number of transactions archived
+    """
+    cutoff = date(cutoff.year, cutoff.month, 1)
+    today = date.today()
+    accounts_closed = transactions_archived = 0
+
+    with engine.connect() as connection:
+        numbers = connection.execute(select(Account._account_number).order_by(Account._account_number)).scalars().all()
+
+    for account_num in numbers:
+        with engine.begin() as connection:
+            count = _close_account(connection, account_num, cutoff, today)
+        if count:
+            accounts_closed += 1
+            transactions_archived += count
+            account_cache.invalidate(account_num)
+            logging.debug(f"Archived {count} transactions for account: {account_num}")
+
+    return accounts_closed, transactions_archived
+
+
+def get_history(session, account_num, start=None, end=None):
+    """Returns the full transaction history of an account, archived and live, for statements
+    and audits. Carried-forward opening entries are left out since the archived transactions
+    they summarize are included.
+
+    Args:
+        account_num (int): account number
+        start (Date, optional): first day to include
+        end (Date, optional): last day to include
+
+    Returns:
+        list: ArchivedTransaction and Transaction objects sorted by date
+    """
+    openings = select(PeriodClose._opening_id).where(PeriodClose._account_id == account_num)
+
+    archived = session.query(ArchivedTransaction).filter(ArchivedTransaction._account_id == account_num,
+                                                          ArchivedTransaction._carried_forward.is_(False))
+    live = session.query(Transaction).filter(Transaction._account_id == account_num,
+                                             Transaction._id.not_in(openings))
+    if start is not None:
+        archived = archived.filter(ArchivedTransaction._date >= start)
+        live = live.filter(Transaction._date >= start)
+    if end is not None:
+        archived = archived.filter(ArchivedTransaction._date <= end)
+        live = live.filter(Transaction._date <= end)
+
+    history = archived.all() + live.all()
+    return sorted(history, key=lambda t: (t.date, t._id))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive transactions before a cutoff month.")
+    parser.add_argument("cutoff", help="first month to keep live, as YYYY-MM")
+    parser.add_argument("--db", default="bank.db", help="path to the SQLite database")
+    args = parser.parse_args()
+
+    cutoff = datetime.strptime(args.cutoff, "%Y-%m").date()
+    engine = create_engine(f"sqlite:///{args.db}")
+    dataBase.metadata.create_all(engine)
+    create_indexes(engine)
+    accounts_closed, transactions_archived = close_period(engine, cutoff)
+    print(f"Archived {transactions_archived:,} transactions from {accounts_closed:,} accounts before {cutoff:%B %Y}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+from bisect import bisect_left, bisect_right
+
+
+class BalanceIndex:
+    """Running-total index over an account's transactions, ordered by (date, id).
+
+    Keeps a list of transaction dates alongside the cumulative sum of their amounts so that
+    point-in-time balances and date-range net flows can be answered with bisect instead of
+    re-summing the whole transaction list.
+
+    Besides its size, the index remembers the newest live transaction it holds and how many period
+    closes it was built with, so an account can check it against the database without loading the
+    transaction list.
+    """
+
+    def __init__(self, transactions=(), archived=(), openings=()):
+        """
+        Args:
+            transactions (list): the account's live transactions, oldest first
+            archived (list): transactions moved to the archive by period closes, see archive.py
+            openings (set): ids of the carried-forward opening entries among the live transactions,
+                which the archived transactions replace
+        """
+        self._dates = []
+        self._sums = []
+        self._size = 0
+
+        ordered = sorted([t for t in transactions if t._id not in openings] + list(archived),
+                         key=lambda t: (t.date, t._id is None, t._id or 0))
+        for t in ordered:
+            self.append(t)
+        # only live transactions count, so the size can be compared with the account's list
+        self._size = len(transactions)
+        self.newest = transactions[-1] if transactions else None
+        self.closes = len(openings)
+
+    def __len__(self):
+        return self._size
+
+    def can_append(self, t):
+        "Checks whether a transaction would keep the index in (date, id) order if appended"
+        return not self._dates or t.date >= self._dates[-1]
+
+    def append(self, t):
+        """Adds a transaction to the end of the index.
+
+        Args:
+            t (Transaction): transaction dated on or after the latest indexed transaction
+        """
+        total = self._sums[-1] if self._sums else 0
+        self._dates.append(t.date)
+        self._sums.append(total + t.amount)
+        self._size += 1
+        self.newest = t
+
+    def balance_as_of(self, day):
+        "Returns the sum of all transactions dated on or before the given day"
+        i = bisect_right(self._dates, day)
+        return self._sums[i - 1] if i else 0
+
+    def net_flow(self, start, end):
+        "Returns the sum of all transactions dated between start and end, inclusive"
+        if end < start:
+            return 0
+        hi = bisect_right(self._dates, end)
+        lo = bisect_left(self._dates, start)
+        if hi <= lo:
+            return 0
+        return self._sums[hi - 1] - (self._sums[lo - 1] if lo else 0)
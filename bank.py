@@ -1,16 +1,35 @@
 import logging
-from accounts import SavingsAccount, CheckingAccount
+import threading
+from accounts import Account, SavingsAccount, CheckingAccount
+from transactions import Transaction
+from exceptions import AccountNotFoundError
+from cache import account_cache
+from loading import account_only, account_totals
+from policies import SAVINGS, CHECKING, get_product
 
 from decimal import Decimal
 from datetime import datetime
 
 from db import dataBase
-from sqlalchemy import Column, Integer
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, select, func
+from sqlalchemy.orm import relationship, object_session
 
 
-SAVINGS = "savings"
-CHECKING = "checking"
+ACCOUNT_CLASSES = {
+    SAVINGS: SavingsAccount,
+    CHECKING: CheckingAccount,
+}
+
+# One lock per account number, shared by every Bank in this process so that
+# concurrent transfers touching the same account are serialized
+_account_locks = {}
+_account_locks_guard = threading.Lock()
+
+
+def _lock_for(account_num):
+    with _account_locks_guard:
+        return _account_locks.setdefault(account_num, threading.Lock())
+
 
 class Bank(dataBase):
 
@@ -20,23 +39,23 @@ class Bank(dataBase):
     _accounts = relationship("Account")
     
     def add_account(self, acct_type, session):
-        """Creates a new Account object and adds it to this bank object. The Account will be a SavingsAccount or CheckingAccount, depending on the type given.
+        """Creates a new Account object and adds it to this bank object. The Account will be a SavingsAccount or CheckingAccount, depending on the kind of the product given.
 
         Args:
-            type (string): "Savings" or "Checking" to indicate the type of account to create
+            type (string): "savings", "checking" or the name of another registered product
         """
-        acct_num = self._generate_account_number()
-        if acct_type == SAVINGS:
-            a = SavingsAccount(acct_num)
-        elif acct_type == CHECKING:
-            a = CheckingAccount(acct_num)
-        else:
+        product = get_product(acct_type)
+        if product is None:
             return None
+
+        acct_num = self._generate_account_number()
+        a = ACCOUNT_CLASSES[product["kind"]](acct_num, product=acct_type)
         
         self._accounts.append(a)
+        account_cache.invalidate(acct_num)
 
         try:
-            self._session.add(a)
+            session.add(a)
             logging.debug("Account added to session.")
         except Exception as e:
             logging.error(f"Error adding account to session: {e}")
@@ -48,6 +67,69 @@ class Bank(dataBase):
         "Accessor method to return accounts"
         return self._accounts
 
+    def get_snapshots(self, session, cache=account_cache, after=None, limit=None):
+        """Returns snapshots of every account in this bank, read through the shared account cache.
+        Cached snapshots are checked against each account's newest transaction id, so postings made
+        by other processes are picked up. Accounts missing from the cache or stale are loaded in one
+        batch, with their balances and latest dates summed up by the database rather than by loading
+        their transactions.
+
+        Args:
+            cache (AccountCache, optional): cache to read through, e.g. a snapshot replica's own cache
+            after (int, optional): only return accounts numbered after this one, to page through the accounts
+            limit (int, optional): return at most this many accounts
+
+        Returns:
+            list: AccountSnapshot objects ordered by account number
+        """
+        query = (session.query(Account._account_number, self._last_id(Account._account_number))
+                        .filter(Account._bank_id == self._id)
+                        .order_by(Account._account_number))
+        if after is not None:
+            query = query.filter(Account._account_number > after)
+        last_ids = dict(query.limit(limit))
+        numbers = list(last_ids)
+        snapshots = {n: cache.get(n, last_ids[n]) for n in numbers}
+
+        missing = [n for n, s in snapshots.items() if s is None]
+        if missing:
+            totals = account_totals(session, missing)
+            loaded = (session.query(Account)
+                      .filter(Account._account_number.in_(missing))
+                      .options(*account_only()))
+            for account in loaded:
+                snapshots[account.account_number] = account.snapshot(totals.get(account.account_number, (0, None, None)))
+                cache.put(account.account_number, snapshots[account.account_number])
+
+        return [snapshots[n] for n in numbers]
+
+    def get_snapshot(self, account_num, cache=account_cache):
+        """Returns a snapshot of one account, read through the shared account cache and checked
+        against the account's newest transaction id.
+
+        Args:
+            account_num (int): account number to search for
+            cache (AccountCache, optional): cache to read through, e.g. a snapshot replica's own cache
+
+        Returns:
+            AccountSnapshot: snapshot of the matching account or None if not found
+        """
+        def load():
+            account = self.get_account(account_num)
+            return account.snapshot() if account is not None else None
+
+        session = object_session(self)
+        if session is None:
+            return cache.get_or_load(account_num, load)
+        return cache.get_or_load(account_num, load, session.scalar(select(self._last_id(account_num))))
+
+    @staticmethod
+    def _last_id(account_num):
+        "Returns a subquery for the id of an account's newest transaction, a single index lookup per account"
+        return (select(func.max(Transaction._id))
+                .where(Transaction._account_id == account_num)
+                .scalar_subquery())
+
     def get_account(self, account_num):
         """Fetches an account by its account number.
 
@@ -58,7 +140,87 @@ class Bank(dataBase):
             Account: matching account or None if not found
         """        
 
+        # look the account up by primary key rather than loading every account of the bank,
+        # and leave its history in the database until something needs all of it
+        session = object_session(self)
+        if session is not None and self._id is not None:
+            account = session.get(Account, account_num, options=account_only())
+            if account is not None and account._bank_id == self._id:
+                return account
+            return None
+
         for x in self._accounts:
             if x._account_number == account_num:
                 return x
         return None
+
+    def transfer(self, from_num, to_num, amt, date, session):
+        """Moves money between two accounts of this bank. Both legs are checked with the usual
+        overdraw, limit and sequence rules and either both are added to the session or neither is.
+
+        Args:
+            from_num (int): account number to withdraw from
+            to_num (int): account number to deposit into
+            amt (Decimal): positive amount to move
+            date (Date): date for both legs of the transfer
+        """
+        self.transfer_batch([(from_num, to_num, amt, date)], session)
+
+    def transfer_batch(self, transfers, session):
+        """Applies several transfers as one unit. Locks for every account involved are taken once,
+        in account number order, so concurrent batches cannot deadlock. The legs are posted inside a
+        savepoint; if any leg is rejected the savepoint is rolled back, so nothing from this batch
+        reaches the database, and the error is raised. Accepted legs stay in the session's
+        transaction until the caller commits or rolls back, provided the engine was made by
+        db.create_bank_engine so that SQLite savepoints nest inside that transaction.
+
+        Args:
+            transfers (list): (from_num, to_num, amt, date) tuples, applied in order
+
+        Raises:
+            AccountNotFoundError: one of the account numbers does not exist
+            ValueError: a transfer has a non-positive amount or the same source and destination
+        """
+        accounts = {}
+        for from_num, to_num, amt, _ in transfers:
+            if from_num == to_num:
+                raise ValueError("Cannot transfer to the same account.")
+            if amt <= 0:
+                raise ValueError("Transfer amount must be positive.")
+            for num in (from_num, to_num):
+                if num not in accounts:
+                    account = self.get_account(num)
+                    if account is None:
+                        raise AccountNotFoundError(num)
+                    accounts[num] = account
+
+        locks = [_lock_for(num) for num in sorted(accounts)]
+        held = []
+        try:
+            for lock in locks:
+                lock.acquire()
+                held.append(lock)
+            self._post_batch(transfers, accounts, session)
+        finally:
+            for lock in reversed(held):
+                lock.release()
+
+    def _post_batch(self, transfers, accounts, session):
+        # every leg is posted inside a savepoint, so legs already written by an autoflush are
+        # undone together with the rest of the batch when a later leg is rejected
+        savepoint = session.begin_nested()
+        try:
+            for from_num, to_num, amt, date in transfers:
+                source, target = accounts[from_num], accounts[to_num]
+                source.add_transaction(-amt, date, session)
+                target.add_transaction(amt, date, session)
+            savepoint.commit()
+            logging.debug(f"Transferred {len(transfers)} batch item(s).")
+        except Exception:
+            savepoint.rollback()
+            # the rollback expires the affected collections; drop what was derived from them
+            for num, account in accounts.items():
+                account._balance_index = None
+                account_cache.invalidate(num)
+            logging.debug("Transfer batch rolled back.")
+            raise
@@ -0,0 +1,128 @@
+"""Measures how long cli.py and gui.py take to become usable.
+
+Each run starts a fresh interpreter in a scratch directory so import costs are included.
+For the CLI the time is measured until BankCLI is constructed; for the GUI it is measured
+until the window is first drawn and until the bank has been loaded behind it.
+
+Usage: python benchmark_startup.py [--runs N] [--accounts N] [--transactions N]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CLI_SNIPPET = """
+import time
+start = time.perf_counter()
+import cli
+from sqlalchemy import create_engine
+from sqlalchemy.orm.session import sessionmaker
+engine = create_engine("sqlite:///bank.db")
+cli.dataBase.metadata.create_all(engine)
+cli.Session = sessionmaker(engine)
+cli.BankCLI()
+print("ready", time.perf_counter() - start)
+"""
+
+GUI_SNIPPET = """
+import time
+start = time.perf_counter()
+import gui
+connect = gui.BankGUI._connect
+
+def timed_connect(self):
+    print("first_paint", time.perf_counter() - start)
+    connect(self)
+    print("loaded", time.perf_counter() - start)
+    self._window.after_idle(self._window.destroy)
+
+gui.BankGUI._connect = timed_connect
+gui.BankGUI()
+"""
+
+
+def seed_database(path, accounts, transactions):
+    "Creates a bank with the given number of accounts, each with the given number of transactions"
+    sys.path.insert(0, REPO_DIR)
+    from datetime import date, timedelta
+    from decimal import Decimal
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm.session import sessionmaker
+    from db import dataBase
+    from bank import Bank, CHECKING
+
+    engine = create_engine(f"sqlite:///{path}")
+    dataBase.metadata.create_all(engine)
+    session = sessionmaker(engine)()
+
+    bank = Bank()
+    session.add(bank)
+    for _ in range(accounts):
+        bank.add_account(CHECKING, session)
+    session.flush()
+
+    for account in bank.show_accounts():
+        for i in range(transactions):
+            account.add_transaction(Decimal("10.00"), date(2023, 1, 1) + timedelta(days=i), session)
+    session.commit()
+    engine.dispose()
+
+
+def run_snippet(snippet, workdir):
+    "Runs a snippet in a fresh interpreter and returns its timing marks"
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    result = subprocess.run([sys.executable, "-c", snippet], cwd=workdir, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed")
+    marks = {}
+    for line in result.stdout.splitlines():
+        name, _, value = line.partition(" ")
+        marks[name] = float(value)
+    return marks
+
+
+def benchmark(name, snippet, runs, db_file):
+    samples = {}
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            if db_file:
+                with open(db_file, "rb") as src, open(os.path.join(workdir, "bank.db"), "wb") as dst:
+                    dst.write(src.read())
+            try:
+                marks = run_snippet(snippet, workdir)
+            except RuntimeError as e:
+                print(f"{name}: skipped ({e})")
+                return
+        for mark, value in marks.items():
+            samples.setdefault(mark, []).append(value)
+
+    for mark, values in samples.items():
+        print(f"{name} {mark:<12} median {statistics.median(values) * 1000:8.1f} ms"
+              f"   min {min(values) * 1000:8.1f} ms   ({len(values)} runs)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time benchmark for the CLI and GUI.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--accounts", type=int, default=0, help="accounts to seed the database with")
+    parser.add_argument("--transactions", type=int, default=0, help="transactions per seeded account")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as seed_dir:
+        db_file = None
+        if args.accounts:
+            db_file = os.path.join(seed_dir, "bank.db")
+            seed_database(db_file, args.accounts, args.transactions)
+
+        benchmark("cli", CLI_SNIPPET, args.runs, db_file)
+        benchmark("gui", GUI_SNIPPET, args.runs, db_file)
+
+
+if __name__ == "__main__":
+    main()
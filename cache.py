@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+
+class AccountSnapshot(namedtuple("AccountSnapshot", ["account_number", "account_type", "balance", "interest_rate",
+                                                     "daily_limit", "monthly_limit", "last_date", "last_id"])):
+    """Read-only copy of the values front-ends display for an account. last_id is the id of the
+    newest transaction the snapshot includes, used to tell whether it is still current.
+    """
+
+    __slots__ = ()
+
+    def __str__(self):
+        """Formats the type, account number, and balance of the account.
+        For example, 'Savings#000000001,<tab>balance: $50.00'
+        """
+        return f"{self.account_type.capitalize()}#{self.account_number:09},\tbalance: ${self.balance:,.2f}"
+
+
+# marks a lookup that does not check the snapshot against the database
+_UNCHECKED = object()
+
+
+class AccountCache:
+    """Bounded least-recently-used cache of account snapshots keyed by account number.
+    Keeps hit and miss counts so the size can be tuned to the workload.
+
+    The cache is per process: invalidate() only reaches snapshots cached in this process, so
+    readers pass the newest transaction id from the database and snapshots that do not include
+    it, e.g. after another process posted to the account, are dropped as stale.
+    """
+
+    def __init__(self, maxsize=1024):
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def get(self, key, last_id=_UNCHECKED):
+        """Returns the cached snapshot for an account number or None, counting a hit or a miss.
+
+        Args:
+            key (int): account number
+            last_id (int, optional): id of the account's newest transaction in the database, or None
+                if it has none. A snapshot with a different last_id is dropped and counts as a miss.
+        """
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            if last_id is not _UNCHECKED and value.last_id != last_id:
+                del self._entries[key]
+                self.misses += 1
+                self.stale += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        "Stores a snapshot, evicting the least recently used one if the cache is full"
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key, loader, last_id=_UNCHECKED):
+        """Read-through lookup.
+
+        Args:
+            key (int): account number
+            loader (callable): returns a fresh snapshot when the account is not cached
+            last_id (int, optional): id of the account's newest transaction in the database, see get()
+
+        Returns:
+            AccountSnapshot: cached or freshly loaded snapshot
+        """
+        value = self.get(key, last_id)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def invalidate(self, key):
+        "Drops the snapshot for an account number so the next read reloads it"
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        "Returns hit/miss counts, stale snapshots dropped, hit ratio and current size"
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+                "maxsize": self._maxsize,
+            }
+
+
+# Shared by every Bank and Account in this process, and only this process
+account_cache = AccountCache()
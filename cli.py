@@ -1,15 +1,18 @@
 # iOS MacBook Air
 
 import sys
+import argparse
 import logging
 from decimal import Decimal, setcontext, BasicContext, InvalidOperation
 from datetime import datetime
 
-from db import dataBase
+from db import dataBase, create_indexes, create_bank_engine
 from sqlalchemy.orm.session import sessionmaker
-from sqlalchemy import create_engine
 
 from bank import Bank
+from cache import account_cache
+from snapshot import SnapshotReplica
+from policies import load_configured_products, product_names, PRODUCTS_ENV
 from exceptions import OverdrawError, TransactionLimitError, TransactionSequenceError
 
 
@@ -22,8 +25,18 @@ logging.basicConfig(filename='bank.log', level=logging.DEBUG,
 class BankCLI:
     """Driver class for a command-line REPL interface to the Bank application"""
 
-    def __init__(self):
-        self._session = Session()
+    def __init__(self, replica=None):
+        """
+        Args:
+            replica (SnapshotReplica, optional): run read-only, reporting from this snapshot of the database
+        """
+        self._replica = replica
+        if replica is None:
+            self._session = Session()
+            self._cache = account_cache
+        else:
+            self._session = replica.session()
+            self._cache = replica.cache
 
         try:
             self._bank = self._session.query(Bank).first()
@@ -31,6 +44,10 @@ class BankCLI:
         except Exception as e:
             logging.error(f"Error requesting bank from the database: {e}")
 
+        if not self._bank and replica is not None:
+            print("There is no bank to report on yet.")
+            sys.exit(1)
+
         if not self._bank:
             self._bank = Bank()
 
@@ -59,24 +76,42 @@ class BankCLI:
             "6": self._monthly_triggers,
             "7": self._quit,
         }
-
-    def _display_menu(self):
-        print(f"""--------------------------------
-Currently selected account: {self._selected_account}
-Enter command
-1: open account
+        self._menu = """1: open account
 2: summary
 3: select account
 4: add transaction
 5: list transactions
 6: interest and fees
-7: quit""")
+7: quit"""
+
+        # reporting only reads, so the commands that post are left out
+        if replica is not None:
+            self._choices = {
+                "1": self._summary,
+                "2": self._select,
+                "3": self._list_transactions,
+                "4": self._refresh,
+                "5": self._quit,
+            }
+            self._menu = """1: summary
+2: select account
+3: list transactions
+4: refresh snapshot
+5: quit"""
+
+    def _display_menu(self):
+        print(f"""--------------------------------
+Currently selected account: {self._selected_account}
+Enter command
+{self._menu}""")
 
     def run(self):
         """Display the menu and respond to choices."""
 
         while True:
             self._display_menu()
+            # end the transaction reads open, so no lock is held while waiting for input
+            self._session.commit()
             choice = input(">")
             action = self._choices.get(choice)
             # expecting a digit 1-9
@@ -88,10 +123,17 @@ Enter command
 
     def _summary(self):
         # dependency on Account objects
-        for x in self._bank.show_accounts():
+        for x in self._bank.get_snapshots(self._session, cache=self._cache):
             print(x)
 
+    def _refresh(self):
+        "Copies the live database into the snapshot again. Objects already read are reloaded from the new copy."
+        self._session.commit()
+        self._replica.refresh()
+        print(f"Snapshot refreshed at {datetime.fromtimestamp(self._replica.refreshed_at):%Y-%m-%d %H:%M:%S}")
+
     def _quit(self):
+        logging.debug(f"Account cache statistics: {self._cache.stats()}")
         sys.exit(0)
 
     def _add_transaction(self):
@@ -125,7 +167,7 @@ Enter command
             print(f"New transactions must be from {ex.latest_date} onward.")
 
     def _open_account(self):
-        acct_type = input("Type of account? (checking/savings)\n>")
+        acct_type = input(f"Type of account? ({'/'.join(product_names())})\n>")
         self._bank.add_account(acct_type, self._session)
             
         self._session.commit()
@@ -155,12 +197,24 @@ Enter command
 
 if __name__ == "__main__":
 
-    engine = create_engine(f"sqlite:///bank.db")
+    parser = argparse.ArgumentParser(description="Command-line interface to the bank.")
+    parser.add_argument("--products", help=f"JSON file of extra account products; defaults to ${PRODUCTS_ENV}")
+    parser.add_argument("--report", action="store_true",
+                        help="read-only summaries and listings from a snapshot copy, without blocking other users")
+    args = parser.parse_args()
+    try:
+        load_configured_products(args.products)
+    except (OSError, ValueError) as e:
+        parser.error(f"could not load products: {e}")
+
+    engine = create_bank_engine("sqlite:///bank.db")
     dataBase.metadata.create_all(engine)
+    create_indexes(engine)
     Session = sessionmaker(engine)
+    replica = SnapshotReplica("bank.db") if args.report else None
 
     try:
-        BankCLI().run()
+        BankCLI(replica).run()
     except Exception as e:
         print("Sorry! Something unexpected happened. Check the logs or contact the developer for assistance.")
         logging.error(str(e.__class__.__name__) + ": " + repr(str(e)))
@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm.session import sessionmaker
+
+from db import dataBase, create_bank_engine
+from bank import Bank, SAVINGS, CHECKING
+from cache import account_cache
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_bank_engine(f"sqlite:///{tmp_path / 'bank.db'}")
+    dataBase.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def Session(engine):
+    account_cache.clear()
+    return sessionmaker(engine)
+
+
+@pytest.fixture
+def bank(Session):
+    "A committed bank with savings account 1 and checking accounts 2 and 3, in a fresh session"
+    session = Session()
+    bank = Bank()
+    session.add(bank)
+    for acct_type in (SAVINGS, CHECKING, CHECKING):
+        bank.add_account(acct_type, session)
+    session.commit()
+    session.close()
+
+    session = Session()
+    yield session.query(Bank).first(), session
+    session.close()
+
+
+class StatementCounter:
+    "Counts the SQL statements an engine executes while active"
+
+    def __init__(self, engine):
+        self._engine = engine
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self._engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self._engine, "before_cursor_execute", self._count)
+
+
+@pytest.fixture
+def statements(engine):
+    return StatementCounter(engine)
@@ -1,4 +1,33 @@
 
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 
 dataBase = declarative_base()
+
+
+def create_indexes(engine):
+    "Adds indexes defined since a database was created; create_all only indexes the tables it creates"
+    for table in dataBase.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+def create_bank_engine(url="sqlite:///bank.db", **kwargs):
+    """Creates an engine whose transactions, including SAVEPOINTs, are controlled by SQLAlchemy.
+
+    pysqlite starts transactions itself and only before writes, so a session's first
+    begin_nested() would become the outermost transaction and committing it would write to
+    disk. Turning off pysqlite's handling and emitting BEGIN when SQLAlchemy begins keeps
+    savepoints inside the session's transaction.
+    """
+    engine = create_engine(url, **kwargs)
+
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    return engine
@@ -0,0 +1,208 @@
+"""Differential check of the production ledger logic against a frozen reference.
+
+Generates random sequences of transactions (dates, amounts, exempt flags) and monthly
+assessments, replays each through a plain O(n) copy of the original Account rules and through
+the real SavingsAccount/CheckingAccount classes, and compares balances, point-in-time balances,
+accepted/rejected outcomes and exception types after every step. In database mode the account is
+stored and fetched again after every commit, so the production checks run against the database
+the way they do behind the front-ends.
+
+Usage: python differential.py [--cases N] [--seed N] [--steps N] [--mode memory|database|both]
+Exits with status 1 on the first mismatch, printing the seed that reproduces it.
+"""
+
+import argparse
+import random
+import sys
+from datetime import date, timedelta
+from decimal import Decimal, setcontext, BasicContext
+
+from sqlalchemy.orm.session import sessionmaker
+
+from db import dataBase, create_bank_engine
+from bank import Bank, SAVINGS, CHECKING
+from accounts import SavingsAccount, CheckingAccount
+from exceptions import OverdrawError, TransactionLimitError, TransactionSequenceError
+
+# context with ROUND_HALF_UP, as in the front-ends
+setcontext(BasicContext)
+
+
+class _ReferenceTransaction:
+    def __init__(self, amt, t_date, exempt):
+        self.amt = amt
+        self.date = t_date
+        self.exempt = exempt
+
+    def last_day_of_month(self):
+        first_of_next_month = date(self.date.year + self.date.month // 12, self.date.month % 12 + 1, 1)
+        return first_of_next_month - timedelta(days=1)
+
+
+class ReferenceAccount:
+    """Frozen copy of the original straightforward rules: every check scans the whole history.
+    Do not optimize this class; it is what the production path is compared against.
+    """
+
+    PRODUCTS = {
+        SAVINGS: {"rate": Decimal("0.0041"), "daily": 2, "monthly": 5, "threshold": None, "fee": None},
+        CHECKING: {"rate": Decimal("0.0008"), "daily": None, "monthly": None, "threshold": 100, "fee": Decimal("-5.44")},
+    }
+
+    def __init__(self, kind):
+        self._product = self.PRODUCTS[kind]
+        self._transactions = []
+
+    def add_transaction(self, amt, t_date, exempt=False):
+        t = _ReferenceTransaction(amt, t_date, exempt)
+        if not exempt:
+            if not (amt >= 0 or self.get_balance() >= abs(amt)):
+                raise OverdrawError()
+            daily, monthly = self._product["daily"], self._product["monthly"]
+            if daily is not None:
+                num_today = len([t2 for t2 in self._transactions if not t2.exempt and t2.date == t_date])
+                num_this_month = len([t2 for t2 in self._transactions if not t2.exempt and
+                                      (t2.date.year, t2.date.month) == (t_date.year, t_date.month)])
+                if num_today >= daily:
+                    raise TransactionLimitError("day", daily)
+                if num_this_month >= monthly:
+                    raise TransactionLimitError("month", monthly)
+            if self._transactions:
+                latest = max(self._transactions, key=lambda t2: t2.date)
+                if t_date < latest.date:
+                    raise TransactionSequenceError(latest.date)
+        self._transactions.append(t)
+
+    def get_balance(self):
+        return sum(t.amt for t in self._transactions)
+
+    def get_balance_as_of(self, day):
+        # summed in date order like the prefix-sum index: with the 9 digit BasicContext the
+        # order of additions can change the rounding of the last digit
+        ordered = sorted(self._transactions, key=lambda t: t.date)
+        return sum(t.amt for t in ordered if t.date <= day)
+
+    def assess_interest_and_fees(self):
+        latest = max(self._transactions, key=lambda t2: t2.date)
+        for t in self._transactions:
+            if t.exempt and (t.date.year, t.date.month) == (latest.date.year, latest.date.month):
+                raise TransactionSequenceError(t.date)
+        self.add_transaction(self.get_balance() * self._product["rate"], latest.last_day_of_month(), exempt=True)
+        if self._product["threshold"] is not None and self.get_balance() < self._product["threshold"]:
+            self.add_transaction(self._product["fee"], latest.last_day_of_month(), exempt=True)
+
+
+def _outcome(action):
+    "Runs an action and returns a comparable description of what happened"
+    try:
+        action()
+    except OverdrawError:
+        return ("OverdrawError",)
+    except TransactionLimitError as e:
+        return ("TransactionLimitError", e.limit_type, e.limit)
+    except TransactionSequenceError as e:
+        return ("TransactionSequenceError", e.latest_date)
+    except ValueError:
+        return ("ValueError",)
+    return ("ok",)
+
+
+def _steps(rng, count):
+    "Generates (kind, amount, date, exempt) steps with dates that mostly move forward"
+    day = date(rng.randint(2020, 2024), rng.randint(1, 12), rng.randint(1, 28))
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.1:
+            yield ("assess", None, None, None)
+            continue
+        # mostly same day or a few days later, sometimes weeks later or backwards
+        day += timedelta(days=rng.choice([0, 0, 0, 1, 2, 5, 17, 40, -3]))
+        amount = Decimal(rng.randint(-20000, 30000)) / 100
+        yield ("add", amount, day, rng.random() < 0.08)
+
+
+def run_case(session, seed, steps, persisted=False):
+    """Replays one random case through both implementations.
+
+    Args:
+        persisted (bool, optional): store the production account and fetch it again with
+            Bank.get_account() after every commit, as the front-ends do, so the checks run on
+            the database path instead of an in-memory history
+
+    Returns:
+        str: description of the first mismatch, or None if both agree throughout
+    """
+    rng = random.Random(seed)
+    kind = rng.choice([SAVINGS, CHECKING])
+    reference = ReferenceAccount(kind)
+    if persisted:
+        bank = Bank()
+        session.add(bank)
+        bank.add_account(kind, session)
+        session.commit()
+        fetch = lambda: bank.get_account(1)
+    else:
+        account = (SavingsAccount if kind == SAVINGS else CheckingAccount)(1)
+        fetch = lambda: account
+
+    for i, (op, amount, day, exempt) in enumerate(_steps(rng, steps)):
+        production = fetch()
+        if op == "assess":
+            expected = _outcome(reference.assess_interest_and_fees)
+            actual = _outcome(lambda: production.assess_interest_and_fees(session))
+        else:
+            expected = _outcome(lambda: reference.add_transaction(amount, day, exempt))
+            actual = _outcome(lambda: production.add_transaction(amount, day, session, exempt=exempt))
+        if persisted:
+            session.commit()
+            production = fetch()
+
+        if expected != actual:
+            return f"step {i} ({op} {amount} {day} exempt={exempt}): expected {expected}, got {actual}"
+        if reference.get_balance() != production.get_balance():
+            return f"step {i}: expected balance {reference.get_balance()}, got {production.get_balance()}"
+        if day is not None and reference.get_balance_as_of(day) != production.get_balance_as_of(day):
+            return (f"step {i}: expected balance as of {day} {reference.get_balance_as_of(day)}, "
+                    f"got {production.get_balance_as_of(day)}")
+    return None
+
+
+def check(seed, steps, persisted):
+    """Runs one case on a scratch in-memory database.
+
+    Returns:
+        str: description of the first mismatch, or None if both implementations agree
+    """
+    engine = create_bank_engine("sqlite://")
+    dataBase.metadata.create_all(engine)
+    # the in-memory mode keeps everything pending, as a detached account would
+    session = sessionmaker(engine, autoflush=persisted)()
+    try:
+        return run_case(session, seed, steps, persisted)
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare production ledger logic with the reference implementation.")
+    parser.add_argument("--cases", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first case; cases use consecutive seeds")
+    parser.add_argument("--steps", type=int, default=40, help="operations per case")
+    parser.add_argument("--mode", choices=["memory", "database", "both"], default="both",
+                        help="replay through an in-memory account, a stored one, or both")
+    args = parser.parse_args()
+
+    modes = {"memory": [False], "database": [True], "both": [False, True]}[args.mode]
+    for seed in range(args.seed, args.seed + args.cases):
+        for persisted in modes:
+            mismatch = check(seed, args.steps, persisted)
+            if mismatch:
+                print(f"Mismatch in {'database' if persisted else 'memory'} mode in case with seed {seed}: {mismatch}")
+                sys.exit(1)
+
+    print(f"{args.cases:,} cases agree.")
+
+
+if __name__ == "__main__":
+    main()
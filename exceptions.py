@@ -16,4 +16,11 @@ class TransactionSequenceError(Exception):
 
     def __init__(self, date):
         super().__init__()
-        self.latest_date = date
\ No newline at end of file
+        self.latest_date = date
+
+class AccountNotFoundError(Exception):
+    "Indicates that no account with the given number exists in this bank"
+
+    def __init__(self, account_num):
+        super().__init__()
+        self.account_num = account_num
@@ -0,0 +1,250 @@
+"""Streams the accounts and transactions tables out of the bank database for analytics.
+
+Rows are read straight from SQLite in chunks, split into shards by account number and written
+by one worker process per shard, as Parquet when pyarrow is installed and as CSV otherwise
+(optionally gzip-compressed). With --incremental only rows added since the previous export to
+the same directory are written. Period closes replace archived rows with an opening entry that
+reuses an old id, so an incremental export refuses to run after a close and a full export is
+needed. File names carry a run number that increases with every export to the directory.
+
+Usage: python export.py OUT_DIR [--db bank.db] [--shards N] [--format parquet|csv] [--compress] [--incremental]
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from sqlalchemy import Boolean, Date
+
+from accounts import Account
+from transactions import Transaction, PeriodClose
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+STATE_FILE = "export_state.json"
+
+# table name: (key column used for chunking and incremental export, column used for sharding)
+TABLES = {
+    Account.__tablename__: ("_account_number", "_account_number"),
+    Transaction.__tablename__: ("_id", "_account_id"),
+}
+_METADATA_TABLES = {Account.__tablename__: Account.__table__, Transaction.__tablename__: Transaction.__table__}
+
+
+def _columns(table_name):
+    "Returns (column name, parquet converter) pairs for a table, in table order"
+    columns = []
+    for column in _METADATA_TABLES[table_name].columns:
+        if isinstance(column.type, Date):
+            convert = date.fromisoformat
+        elif isinstance(column.type, Boolean):
+            convert = bool
+        else:
+            convert = None
+        columns.append((column.name, convert))
+    return columns
+
+
+def _arrow_type(column):
+    if isinstance(column.type, Date):
+        return pa.date32()
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if column.type.python_type is int:
+        return pa.int64()
+    if column.type.python_type is str:
+        return pa.string()
+    return pa.float64()
+
+
+class _CSVWriter:
+    def __init__(self, path, header, compress):
+        self._file = gzip.open(path, "wt", newline="") if compress else open(path, "w", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(header)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path, table_name, header):
+        table = _METADATA_TABLES[table_name]
+        self._schema = pa.schema([(name, _arrow_type(column)) for name, column in zip(header, table.columns)])
+        self._converters = [convert for _, convert in _columns(table_name)]
+        self._writer = pq.ParquetWriter(path, self._schema, compression="snappy")
+
+    def write(self, rows):
+        # one row group per chunk
+        columns = list(zip(*rows))
+        arrays = []
+        for values, convert, field in zip(columns, self._converters, self._schema):
+            if convert is not None:
+                values = [None if v is None else convert(v) for v in values]
+            arrays.append(pa.array(values, type=field.type))
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def export_shard(db_path, out_dir, table_name, shard, shards, lower, upper, fmt, compress, chunk_size, run):
+    """Writes one shard of a table: rows whose shard column modulo the shard count equals the shard,
+    with keys in (lower, upper]. Runs in a worker process with its own read-only connection.
+
+    Returns:
+        tuple: path written (or None if the shard was empty) and number of rows
+    """
+    key, shard_column = TABLES[table_name]
+    names = [name for name, _ in _columns(table_name)]
+    header = [name.lstrip("_") for name in names]
+    query = (f"SELECT {', '.join(names)} FROM {table_name} "
+             f"WHERE {key} > ? AND {key} <= ? AND COALESCE({shard_column}, 0) % ? = ? "
+             f"ORDER BY {key} LIMIT ?")
+    key_index = names.index(key)
+
+    connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    writer = path = None
+    count = 0
+    try:
+        last = lower
+        while True:
+            rows = connection.execute(query, (last, upper, shards, shard, chunk_size)).fetchall()
+            if not rows:
+                break
+            if writer is None:
+                name = f"{table_name.lstrip('_')}-{run:06}-{shard:03}"
+                if fmt == "parquet":
+                    path = os.path.join(out_dir, f"{name}.parquet")
+                    writer = _ParquetWriter(path, table_name, header)
+                else:
+                    path = os.path.join(out_dir, f"{name}.csv" + (".gz" if compress else ""))
+                    writer = _CSVWriter(path, header, compress)
+            writer.write(rows)
+            count += len(rows)
+            last = rows[-1][key_index]
+    finally:
+        if writer is not None:
+            writer.close()
+        connection.close()
+    return path, count
+
+
+def _load_state(out_dir):
+    path = os.path.join(out_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _latest_close(connection):
+    "Returns the id of the newest period close, or 0 for a database that has never been archived"
+    closes = PeriodClose.__tablename__
+    if connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (closes,)).fetchone() is None:
+        return 0
+    return connection.execute(f"SELECT MAX(_id) FROM {closes}").fetchone()[0] or 0
+
+
+def _save_state(out_dir, state):
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def export(db_path, out_dir, shards=4, fmt=None, compress=False, incremental=False, chunk_size=50000):
+    """Exports every table in TABLES with one worker process per shard.
+
+    Args:
+        db_path (string): path of the SQLite database; a snapshot copy works too
+        out_dir (string): directory for the shard files and the incremental export state
+        shards (int): number of shards and worker processes per table
+        fmt (string, optional): "parquet" or "csv"; defaults to parquet when pyarrow is installed
+        compress (bool, optional): gzip CSV output
+        incremental (bool, optional): only export rows added since the last export to out_dir
+        chunk_size (int): rows fetched and written per chunk
+
+    Returns:
+        dict: rows exported per table
+
+    Raises:
+        ValueError: an incremental export was asked for but accounts were closed since the last
+            export, which changes rows that were already exported
+    """
+    fmt = fmt or ("parquet" if pa is not None else "csv")
+    if fmt == "parquet" and pa is None:
+        raise ValueError("Parquet export requires pyarrow; use the csv format instead.")
+
+    os.makedirs(out_dir, exist_ok=True)
+    state = _load_state(out_dir)
+    # numbers every export to the directory, so no run overwrites the files of an earlier one
+    run = state.get("run", 0) + 1
+    positions = state if incremental else {}
+
+    # fix the upper bound of every table first so all shards export the same set of rows
+    connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    bounds = {}
+    try:
+        latest_close = _latest_close(connection)
+        if incremental and latest_close > state.get(PeriodClose.__tablename__, 0):
+            raise ValueError("Accounts were closed since the last export to this directory, "
+                             "which replaces rows already exported; run a full export instead.")
+        for table_name, (key, _) in TABLES.items():
+            upper = connection.execute(f"SELECT MAX({key}) FROM {table_name}").fetchone()[0]
+            bounds[table_name] = (positions.get(table_name, 0), upper if upper is not None else 0)
+    finally:
+        connection.close()
+
+    exported = {}
+    with ProcessPoolExecutor(max_workers=shards) as pool:
+        futures = {
+            table_name: [pool.submit(export_shard, db_path, out_dir, table_name, shard, shards, lower, upper,
+                                     fmt, compress, chunk_size, run)
+                         for shard in range(shards)]
+            for table_name, (lower, upper) in bounds.items()
+        }
+        for table_name, shard_futures in futures.items():
+            exported[table_name] = sum(future.result()[1] for future in shard_futures)
+
+    # only advance the incremental position once every shard has been written
+    state = {table_name: max(lower, upper) for table_name, (lower, upper) in bounds.items()}
+    state.update({PeriodClose.__tablename__: latest_close, "run": run})
+    _save_state(out_dir, state)
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export accounts and transactions for analytics.")
+    parser.add_argument("out_dir", help="directory to write shard files to")
+    parser.add_argument("--db", default="bank.db", help="path to the SQLite database")
+    parser.add_argument("--shards", type=int, default=4, help="shards and worker processes per table")
+    parser.add_argument("--format", choices=["parquet", "csv"], help="defaults to parquet when pyarrow is installed")
+    parser.add_argument("--compress", action="store_true", help="gzip CSV output")
+    parser.add_argument("--incremental", action="store_true", help="only export rows added since the last run")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="rows fetched per query")
+    args = parser.parse_args()
+
+    try:
+        exported = export(args.db, args.out_dir, args.shards, args.format, args.compress, args.incremental,
+                          args.chunk_size)
+    except ValueError as e:
+        parser.error(str(e))
+    for table_name, count in exported.items():
+        print(f"{table_name}: {count:,} rows")
+
+
+if __name__ == "__main__":
+    main()
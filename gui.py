@@ -1,5 +1,6 @@
 # iOS MacBook Air
 
+import argparse
 import logging
 from decimal import Decimal, setcontext, BasicContext, InvalidOperation
 from datetime import datetime
@@ -7,14 +8,9 @@ from datetime import datetime
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
-from tkcalendar import Calendar
-from db import dataBase
-from sqlalchemy.orm.session import sessionmaker
-from sqlalchemy import create_engine
-
-from bank import Bank
 from exceptions import OverdrawError, TransactionLimitError, TransactionSequenceError
 
+from policies import load_configured_products, product_names, PRODUCTS_ENV
 from list_accounts import AccountList
 from list_transactions import TransactionsGUI
 
@@ -27,20 +23,80 @@ logging.basicConfig(filename='bank.log', level=logging.DEBUG,
 class BankGUI:
     """Driver class for a graphic interface to the Bank application"""
 
+    # Number of accounts loaded and drawn per event loop turn
+    PAGE_SIZE = 25
+
     @staticmethod
     def handle_exception(exception_type, exception, traceback):
         error_message = f"An exception of type {exception_type.__name__} occurred with the following message: {exception}"
         print(error_message)  # Print the error message
         logging.error(error_message)  # Log the error message
+        messagebox.showwarning("Error", "Sorry! Something unexpected happened. Check the logs or contact the developer for assistance.")
+
+    def __init__(self, replica=None):
+        """
+        Args:
+            replica (SnapshotReplica, optional): run read-only, reporting from this snapshot of the database
+        """
+        self._replica = replica
 
-    def __init__(self):
         # Create the window
         self._window = tk.Tk()
-        self._window.title("My Bank")
+        self._window.title("My Bank" if replica is None else "My Bank (report)")
         self._window.resizable(False, False)
 
+        # Errors raised while loading after the first paint happen inside the event loop
+        self._window.report_callback_exception = self.handle_exception
+
+        self._session = None
+        self._cache = None
+        self._bank = None
+        self._selected_account = None
+        self._pending_page = None
+
+        # Create the GUI content
+        self.create_gui()
+
+    def _connect(self):
+        """Opens the database and loads the bank. Scheduled after the window is first drawn so
+        that importing SQLAlchemy and the ORM mapping does not delay the window appearing.
+        The accounts are then loaded a page per event loop turn, see _load_page.
+        """
+        try:
+            self._open_bank()
+        except Exception as e:
+            self._load_failed(e)
+            return
+
+        for widget in self._header_widgets:
+            widget.configure(state="normal")
+        if self._replica is None:
+            self._account_type_combo.configure(state="readonly")
+
+        self._summary()
+
+    def _load_failed(self, error):
+        logging.error(f"Error loading the bank: {error.__class__.__name__}: {error}")
+        self._body.show_error()
+        messagebox.showerror("Error", "The bank could not be loaded. Check the logs or contact the developer for assistance.")
+
+    def _open_bank(self):
+        from sqlalchemy.orm.session import sessionmaker
+        from db import dataBase, create_indexes, create_bank_engine
+        from bank import Bank
+        from cache import account_cache
+
+        if self._replica is not None:
+            self._open_report()
+            return
+
+        self._cache = account_cache
+        engine = create_bank_engine("sqlite:///bank.db")
+        dataBase.metadata.create_all(engine)
+        create_indexes(engine)
+
         # Create a session
-        self._session = Session()
+        self._session = sessionmaker(engine)()
 
         # Create or retrieve the bank object
         try:
@@ -64,10 +120,27 @@ class BankGUI:
             except Exception as e:
                 logging.error(f"Error committing bank to the database: {e}")
 
-        self._selected_account = None
+    def _open_report(self):
+        "Opens the bank read-only on the snapshot, through the snapshot's own account cache"
+        from bank import Bank
 
-        # Create the GUI content
-        self.create_gui()
+        self._session = self._replica.session()
+        self._cache = self._replica.cache
+        self._bank = self._session.query(Bank).first()
+        if not self._bank:
+            raise LookupError("There is no bank to report on yet.")
+
+    def _refresh(self):
+        "Copies the live database into the snapshot again and redraws from the new copy"
+        self._end_read()
+        try:
+            self._replica.refresh()
+        except Exception as e:
+            logging.error(f"Error refreshing snapshot: {e}")
+            messagebox.showwarning("Error", "The snapshot could not be refreshed. Check the logs or contact the developer for assistance.")
+            return
+        self._list_transactions()
+        self._summary()
 
     def create_gui(self):
         """Function to Generate Main GUI page."""
@@ -78,12 +151,24 @@ class BankGUI:
 
         # Bank Header Options
         self.acct_type = tk.StringVar(value="Open Account")
-        account_type_combo = ttk.Combobox(self._gui, textvariable=self.acct_type, values=["Savings", "Checking"], state="readonly")
-        account_type_combo.bind("<<ComboboxSelected>>", self._open_account)
-        account_type_combo.grid(row=1, column=1, columnspan=2)
-
-        tk.Button(self._gui, text="Add Transaction", command=self._add_transaction).grid(row=1, column=3, columnspan=2)
-        tk.Button(self._gui, text="Interest and Fees", command=self._monthly_triggers).grid(row=1, column=5, columnspan=2)
+        self._products_by_label = {name.capitalize(): name for name in product_names()}
+        self._account_type_combo = ttk.Combobox(self._gui, textvariable=self.acct_type, values=list(self._products_by_label), state="disabled")
+        self._account_type_combo.bind("<<ComboboxSelected>>", self._open_account)
+        self._account_type_combo.grid(row=1, column=1, columnspan=2)
+
+        # Header buttons stay disabled until the bank has been loaded. Reports only read, so they
+        # get a refresh button instead of the commands that post.
+        if self._replica is None:
+            self._header_widgets = [
+                tk.Button(self._gui, text="Add Transaction", command=self._add_transaction, state="disabled"),
+                tk.Button(self._gui, text="Interest and Fees", command=self._monthly_triggers, state="disabled"),
+            ]
+        else:
+            self._header_widgets = [
+                tk.Button(self._gui, text="Refresh Snapshot", command=self._refresh, state="disabled"),
+            ]
+        for column, widget in enumerate(self._header_widgets):
+            widget.grid(row=1, column=3 + 2 * column, columnspan=2)
         self._gui.pack()
 
         # Create a frame for displaying transactions
@@ -96,12 +181,16 @@ class BankGUI:
         self._body = AccountList(self._gui, self._select) 
         self._body.grid(row=2, column=1, columnspan=2, sticky="wn")
         self._body.configure(pady=10)
-        self._summary()
+        self._body.show_loading()
+
+        # Draw the skeleton first, then load the bank once the event loop is running
+        self._window.update_idletasks()
+        self._window.after(1, self._connect)
 
         self._window.mainloop()
 
     def _open_account(self, event):
-        acct_type = self.acct_type.get().lower()
+        acct_type = self._products_by_label[self.acct_type.get()]
         self._bank.add_account(acct_type, self._session)
         self.acct_type.set("Open Account")
         try:
@@ -117,18 +206,54 @@ class BankGUI:
         if self._selected_account is not None:
             transactions = self._selected_account.get_transactions()
             self._transaction.update_transactions(transactions)  # Update Transactions
+            self._end_read()
+
+    def _end_read(self):
+        "Ends the transaction reads open, so no lock is held while the window waits for input"
+        try:
+            self._session.commit()
+        except Exception as e:
+            logging.error(f"Error ending read transaction: {e}")
 
     def _summary(self):
-        accounts = self._bank.show_accounts()
-        self._body.add_account(accounts)
+        # restart from the first page if an earlier summary is still loading
+        if self._pending_page is not None:
+            self._window.after_cancel(self._pending_page)
+            self._pending_page = None
+        self._body.clear_accounts()
+        self._load_page(None)
+
+    def _load_page(self, after):
+        """Loads and draws one page of accounts, then schedules the next page so the window keeps
+        handling events between queries.
+
+        Args:
+            after (int): last account number already shown, or None for the first page
+        """
+        self._pending_page = None
+        try:
+            accounts = self._bank.get_snapshots(self._session, cache=self._cache, after=after, limit=self.PAGE_SIZE)
+        except Exception as e:
+            self._load_failed(e)
+            return
+        self._end_read()
+
+        last = len(accounts) < self.PAGE_SIZE
+        self._body.add_page(accounts, last)
+        if not last:
+            self._pending_page = self._window.after(1, self._load_page, accounts[-1].account_number)
 
     def _select(self, num):
         self._selected_account = self._bank.get_account(num)
         self._list_transactions()
+        self._end_read()
 
     def _add_transaction(self):
         """GUI and handling the trasaction function"""
 
+        # tkcalendar is only needed by this dialog, so it is imported the first time it opens
+        from tkcalendar import Calendar
+
         # New Window
         self._transaction_window = tk.Toplevel(self._window, padx=20, pady=20)
         self._transaction_window.title("Add Transaction")
@@ -228,12 +353,22 @@ class BankGUI:
 
 
 if __name__ == "__main__":
-    engine = create_engine(f"sqlite:///bank.db")
-    dataBase.metadata.create_all(engine)
-    Session = sessionmaker(engine)
+    parser = argparse.ArgumentParser(description="Graphic interface to the bank.")
+    parser.add_argument("--products", help=f"JSON file of extra account products; defaults to ${PRODUCTS_ENV}")
+    parser.add_argument("--report", action="store_true",
+                        help="read-only summaries and listings from a snapshot copy, without blocking other users")
+    args = parser.parse_args()
+    try:
+        load_configured_products(args.products)
+    except (OSError, ValueError) as e:
+        parser.error(f"could not load products: {e}")
 
     try:
-        BankGUI()
+        replica = None
+        if args.report:
+            from snapshot import SnapshotReplica
+            replica = SnapshotReplica("bank.db")
+        BankGUI(replica)
     except Exception as e:
         messagebox.showwarning("Error", "Sorry! Something unexpected happened. Check the logs or contact the developer for assistance.")
         logging.error(str(e.__class__.__name__) + ": " + repr(str(e)))
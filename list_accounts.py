@@ -2,7 +2,7 @@ import tkinter as tk
 from account import AccountItem
 
 class AccountList(tk.Frame):
-    """Graphics for accounts."""
+    """Graphics for accounts. Accounts arrive a page at a time, see BankGUI._load_page."""
 
     def __init__(self, parent, select_callback):
         super().__init__(parent)
@@ -16,20 +16,36 @@ class AccountList(tk.Frame):
         self.empty_label = tk.Label(self, text="No accounts found.")
         self.empty_label.pack(anchor="w")
 
+    def show_loading(self):
+        "Shows a placeholder until the first accounts arrive"
+        self.empty_label.config(text="Loading accounts...")
+        self.empty_label.pack(anchor="w")
+
+    def show_error(self):
+        "Replaces the accounts with a note that they could not be loaded"
+        self.clear_accounts()
+        self.empty_label.config(text="Accounts could not be loaded.")
+        self.empty_label.pack(anchor="w")
+
     def clear_accounts(self):
         for label in self._account_labels:
             label.destroy()
         self._account_labels = []
 
-    def add_account(self, accounts):
-        self.clear_accounts()
+    def add_page(self, accounts, last):
+        """Draws one page of accounts below the ones already shown.
 
-        if not accounts:
-            self.empty_label.pack()
-        else:
+        Args:
+            accounts (list): AccountSnapshot objects to draw
+            last (bool): no more pages follow
+        """
+        if accounts:
             self.empty_label.pack_forget()
-
         for account in accounts:
             account_item = AccountItem(self, account, self._select_callback)
             account_item.pack(fill="x")
             self._account_labels.append(account_item)
+
+        if last and not self._account_labels:
+            self.empty_label.config(text="No accounts found.")
+            self.empty_label.pack(anchor="w")
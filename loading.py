@@ -0,0 +1,41 @@
+from sqlalchemy import select
+from sqlalchemy.orm import raiseload
+
+from accounts import Account
+from transactions import Transaction
+
+
+# Loader options for the ways the front-ends walk Bank -> Account -> Transaction.
+# Relationships stay lazy by default, so callers opt into a profile per query.
+
+
+def account_only():
+    """Options for an account without its history. Touching the transaction collection directly
+    raises instead of silently loading it: posting asks the database for the balance, the latest
+    date and the current month, and only listings and point-in-time balances load the history,
+    in one query. Built on use, since building options configures the mappers, and Bank is not
+    mapped yet when bank.py imports this module.
+    """
+    return (raiseload(Account._transactions),)
+
+
+def account_totals(session, account_numbers):
+    """Sums up the balance and finds the latest transaction date and id of several accounts in one
+    query, for summaries of accounts loaded with account_only(). Amounts are added in id order in
+    Python, exactly as Account.get_balance() adds them, rather than with SQL SUM over floats.
+
+    Args:
+        session (Session): session to query with
+        account_numbers (list): accounts to total
+
+    Returns:
+        dict: (balance, latest date, latest id) by account number, for accounts with at least one transaction
+    """
+    rows = session.execute(select(Transaction._account_id, Transaction._amt, Transaction._date, Transaction._id)
+                           .where(Transaction._account_id.in_(account_numbers))
+                           .order_by(Transaction._account_id, Transaction._id))
+    totals = {}
+    for account_num, amt, t_date, t_id in rows:
+        balance, latest, _ = totals.get(account_num, (0, None, None))
+        totals[account_num] = (balance + amt, t_date if latest is None or t_date > latest else latest, t_id)
+    return totals
@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+from exceptions import TransactionLimitError
+
+
+# Account kinds map to the mapped Account subclasses; products are variants of a kind
+SAVINGS = "savings"
+CHECKING = "checking"
+KINDS = (SAVINGS, CHECKING)
+
+# Environment variable naming a JSON product file for the front ends to load at start-up
+PRODUCTS_ENV = "BANK_PRODUCTS"
+
+_PRODUCT_FIELDS = {"kind", "interest_rate", "daily_limit", "monthly_limit", "balance_threshold", "low_balance_fee"}
+
+# Product definitions by name. Limits left out mean no limit, and a fee only applies when
+# both a balance threshold and a fee amount are given.
+_products = {
+    SAVINGS: {"kind": SAVINGS, "interest_rate": "0.0041", "daily_limit": 2, "monthly_limit": 5},
+    CHECKING: {"kind": CHECKING, "interest_rate": "0.0008", "balance_threshold": 100, "low_balance_fee": "-5.44"},
+}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_amount(value):
+    "Amounts may be numbers or strings so JSON files can give exact decimals"
+    if isinstance(value, str):
+        try:
+            return Decimal(value).is_finite()
+        except InvalidOperation:
+            return False
+    return _is_number(value)
+
+
+def _validate_product(name, definition):
+    """Checks a product definition before it is registered.
+
+    Raises:
+        ValueError: the definition is missing a required field or has an unknown field or a bad value
+    """
+    if not isinstance(name, str) or not name:
+        raise ValueError(f"Product name must be a non-empty string, not {name!r}")
+    if not isinstance(definition, dict):
+        raise ValueError(f"Product {name} must be defined by a mapping of fields")
+    unknown = set(definition) - _PRODUCT_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown product fields for {name}: {', '.join(sorted(unknown))}")
+    if definition.get("kind") not in KINDS:
+        raise ValueError(f"Product {name} must have kind {' or '.join(KINDS)}")
+    if "interest_rate" not in definition:
+        raise ValueError(f"Product {name} must have an interest_rate")
+    if not _is_amount(definition["interest_rate"]):
+        raise ValueError(f"Product {name} has an invalid interest_rate: {definition['interest_rate']!r}")
+    for field in ("daily_limit", "monthly_limit"):
+        limit = definition.get(field)
+        if limit is not None and not (isinstance(limit, int) and not isinstance(limit, bool) and limit > 0):
+            raise ValueError(f"Product {name} has an invalid {field}: {limit!r}")
+    if ("balance_threshold" in definition) != ("low_balance_fee" in definition):
+        raise ValueError(f"Product {name} must give balance_threshold and low_balance_fee together")
+    if "balance_threshold" in definition and not _is_number(definition["balance_threshold"]):
+        raise ValueError(f"Product {name} has an invalid balance_threshold: {definition['balance_threshold']!r}")
+    if "low_balance_fee" in definition and not _is_amount(definition["low_balance_fee"]):
+        raise ValueError(f"Product {name} has an invalid low_balance_fee: {definition['low_balance_fee']!r}")
+
+
+def register_product(name, definition):
+    """Adds or replaces a product definition.
+
+    Args:
+        name (string): product name used when opening accounts
+        definition (dict): kind, interest_rate and optional daily_limit, monthly_limit,
+            balance_threshold and low_balance_fee
+
+    Raises:
+        ValueError: the definition is missing kind or interest_rate, has unknown fields,
+            or has a value of the wrong type
+    """
+    _validate_product(name, definition)
+    _products[name] = dict(definition)
+    logging.debug(f"Registered product: {name}")
+
+
+def load_products(path):
+    """Registers every product in a JSON file mapping product names to definitions.
+    Every definition is checked before any is registered, so a bad file changes nothing.
+
+    Raises:
+        ValueError: the file is not a mapping or a definition is invalid
+    """
+    with open(path) as f:
+        products = json.load(f)
+    if not isinstance(products, dict):
+        raise ValueError(f"{path} must map product names to definitions")
+    for name, definition in products.items():
+        _validate_product(name, definition)
+    for name, definition in products.items():
+        register_product(name, definition)
+
+
+def load_configured_products(path=None):
+    """Loads the product file given, or the one named by the BANK_PRODUCTS environment variable.
+    Does nothing when neither is set.
+    """
+    path = path or os.environ.get(PRODUCTS_ENV)
+    if path:
+        load_products(path)
+        logging.debug(f"Loaded products from {path}")
+
+
+def product_names():
+    "Returns the names of every registered product"
+    return list(_products)
+
+
+def get_product(name):
+    "Returns the product definition with the given name or None"
+    return _products.get(name)
+
+
+def apply_product(account, name):
+    """Copies a product's rule values onto an account's columns.
+
+    Args:
+        account (Account): newly created account
+        name (string): product name
+    """
+    product = _products[name]
+    account._interest_rate = Decimal(str(product["interest_rate"]))
+    account._daily_limit = product.get("daily_limit", float("inf"))
+    account._monthly_limit = product.get("monthly_limit", float("inf"))
+    account._balance_threshold = product.get("balance_threshold")
+    account._low_balance_fee = Decimal(str(product["low_balance_fee"])) if "low_balance_fee" in product else None
+
+
+class Policy:
+    """Compiled limit, fee and interest rules for one set of product values.
+    Rules that cannot apply are compiled down to no-ops so accounts without limits or fees
+    pay nothing for them per transaction.
+    """
+
+    def __init__(self, interest_rate, daily_limit, monthly_limit, balance_threshold, low_balance_fee):
+        self._interest_rate = interest_rate
+        self.check_limits = self._compile_limits(daily_limit, monthly_limit)
+        self.assess_fees = self._compile_fees(balance_threshold, low_balance_fee)
+
+    @staticmethod
+    def _compile_limits(daily_limit, monthly_limit):
+        daily_limit = float("inf") if daily_limit is None else daily_limit
+        monthly_limit = float("inf") if monthly_limit is None else monthly_limit
+        if daily_limit == float("inf") and monthly_limit == float("inf"):
+            return _no_limits
+
+        # limits come back from the database as Decimal; report them as whole counts
+        daily_limit = int(daily_limit) if daily_limit != float("inf") else daily_limit
+        monthly_limit = int(monthly_limit) if monthly_limit != float("inf") else monthly_limit
+
+        def check_limits(transactions, t1):
+            """Determines if the incoming transaction is within the account's transaction limits
+
+            Raises:
+                TransactionLimitError: the daily or monthly limit has been reached
+            """
+            # Count non-exempt transactions in the same month as t1, and on the same day, in one pass
+            num_today = num_this_month = 0
+            for t2 in transactions:
+                if not t2.is_exempt() and t2.in_same_month(t1):
+                    num_this_month += 1
+                    if t2.in_same_day(t1):
+                        num_today += 1
+            if num_today >= daily_limit:
+                raise TransactionLimitError("day", daily_limit)
+            if num_this_month >= monthly_limit:
+                raise TransactionLimitError("month", monthly_limit)
+
+        return check_limits
+
+    @staticmethod
+    def _compile_fees(balance_threshold, low_balance_fee):
+        if balance_threshold is None or low_balance_fee is None:
+            return _no_fees
+
+        def assess_fees(account, latest_transaction, session):
+            "Adds a low balance fee if the balance is below the product's threshold"
+            if account.get_balance() < balance_threshold:
+                account.add_transaction(low_balance_fee,
+                                        date=latest_transaction.last_day_of_month(),
+                                        session=session,
+                                        exempt=True)
+
+        return assess_fees
+
+    def assess_interest(self, account, latest_transaction, session):
+        "Adds interest on the current balance as a new transaction exempt from limits"
+        account.add_transaction(account.get_balance() * self._interest_rate,
+                                date=latest_transaction.last_day_of_month(),
+                                session=session,
+                                exempt=True)
+
+
+def _no_limits(transactions, t):
+    pass
+
+
+def _no_fees(account, latest_transaction, session):
+    pass
+
+
+@lru_cache(maxsize=None)
+def compile_policy(interest_rate, daily_limit, monthly_limit, balance_threshold, low_balance_fee):
+    "Returns the Policy for a set of product values, compiled once and shared by every account using them"
+    return Policy(interest_rate, daily_limit, monthly_limit, balance_threshold, low_balance_fee)
@@ -0,0 +1,225 @@
+import argparse
+import sys
+from collections import namedtuple, Counter
+
+from sqlalchemy import create_engine, select, and_, inspect, false
+
+import bank  # registers the Bank mapping that Account refers to
+from accounts import Account
+from transactions import Transaction
+from archive import PeriodClose
+from snapshot import SnapshotReplica
+
+
+ORPHANED = "orphaned transaction"
+SEQUENCE = "sequence violation"
+OVERDRAW = "overdraw"
+DAILY_LIMIT = "daily limit exceeded"
+MONTHLY_LIMIT = "monthly limit exceeded"
+DUPLICATE_INTEREST = "duplicate interest"
+DUPLICATE_FEE = "duplicate fee"
+
+Issue = namedtuple("Issue", ["kind", "account_number", "transaction_id", "date", "detail"])
+
+
+class ReconciliationReport:
+    """Counts of every invariant violation found, plus a bounded sample of the offending rows."""
+
+    def __init__(self, max_issues=100):
+        self._max_issues = max_issues
+        self.counts = Counter()
+        self.issues = []
+        self.transactions = 0
+        self.accounts = 0
+
+    def add(self, issue):
+        self.counts[issue.kind] += 1
+        if len(self.issues) < self._max_issues:
+            self.issues.append(issue)
+
+    def is_clean(self):
+        return not self.counts
+
+    def __str__(self):
+        lines = [f"Checked {self.transactions:,} transactions across {self.accounts:,} accounts."]
+        if self.is_clean():
+            lines.append("No issues found.")
+            return "\n".join(lines)
+
+        for kind, count in sorted(self.counts.items()):
+            lines.append(f"{kind}: {count:,}")
+        lines.append("")
+        for issue in self.issues:
+            account = f"#{issue.account_number:09}" if issue.account_number is not None else "no account"
+            lines.append(f"{issue.kind}: {account}, transaction {issue.transaction_id}, {issue.date}: {issue.detail}")
+        if sum(self.counts.values()) > len(self.issues):
+            lines.append(f"... {sum(self.counts.values()) - len(self.issues):,} more not shown")
+        return "\n".join(lines)
+
+
+class _AccountState:
+    """Running state for the account currently being streamed. Transactions arrive in id order,
+    which is the order they were added, so only the current day and month need to be kept.
+    """
+
+    def __init__(self, row):
+        self.account_number = row._account_id
+        self.daily_limit = row._daily_limit
+        self.monthly_limit = row._monthly_limit
+        self.has_fee = row._balance_threshold is not None and row._low_balance_fee is not None
+        self.fee = row._low_balance_fee
+        self.balance = 0
+        self.latest_date = None
+        self.day = None
+        self.month = None
+        self.num_today = 0
+        self.num_this_month = 0
+        self.exempt_month = None
+        self.interest_this_month = 0
+        self.fees_this_month = 0
+
+    def check(self, row, report):
+        t_date, amt = row._date, row._amt
+
+        if row._opening:
+            # carried-forward balance left by a period close, see archive.py
+            pass
+        elif row._exempt:
+            self._check_assessment(row, report)
+        else:
+            if self.latest_date is not None and t_date < self.latest_date:
+                report.add(Issue(SEQUENCE, self.account_number, row._id, t_date,
+                                 f"dated before the latest transaction on {self.latest_date}"))
+            else:
+                self._check_limits(row, report)
+            if amt < 0 and self.balance < -amt:
+                report.add(Issue(OVERDRAW, self.account_number, row._id, t_date,
+                                 f"withdrawal of {-amt:,.2f} with a balance of {self.balance:,.2f}"))
+
+        self.balance += amt
+        if self.latest_date is None or t_date > self.latest_date:
+            self.latest_date = t_date
+
+    def _check_limits(self, row, report):
+        t_date = row._date
+        month = (t_date.year, t_date.month)
+        if t_date != self.day:
+            self.day, self.num_today = t_date, 0
+        if month != self.month:
+            self.month, self.num_this_month = month, 0
+
+        if self.daily_limit is not None and self.num_today >= self.daily_limit:
+            report.add(Issue(DAILY_LIMIT, self.account_number, row._id, t_date,
+                             f"more than {int(self.daily_limit)} transactions on this day"))
+        if self.monthly_limit is not None and self.num_this_month >= self.monthly_limit:
+            report.add(Issue(MONTHLY_LIMIT, self.account_number, row._id, t_date,
+                             f"more than {int(self.monthly_limit)} transactions in this month"))
+        self.num_today += 1
+        self.num_this_month += 1
+
+    def _check_assessment(self, row, report):
+        # assess_interest_and_fees posts at most one interest and one fee transaction per month
+        month = (row._date.year, row._date.month)
+        if month != self.exempt_month:
+            self.exempt_month, self.interest_this_month, self.fees_this_month = month, 0, 0
+
+        if self.has_fee and row._amt == self.fee:
+            self.fees_this_month += 1
+            if self.fees_this_month > 1:
+                report.add(Issue(DUPLICATE_FEE, self.account_number, row._id, row._date,
+                                 "more than one low balance fee in this month"))
+        else:
+            self.interest_this_month += 1
+            if self.interest_this_month > 1:
+                report.add(Issue(DUPLICATE_INTEREST, self.account_number, row._id, row._date,
+                                 "more than one interest posting in this month"))
+
+
+def _stream(connection, stmt, chunk_size):
+    """Yields the rows of one ordered select, fetched chunk_size rows at a time, so memory stays
+    bounded no matter how many rows match and the database sorts (or walks an index) only once.
+    """
+    result = connection.execution_options(stream_results=True, yield_per=chunk_size).execute(stmt)
+    for chunk in result.partitions():
+        yield from chunk
+
+
+def reconcile(engine, chunk_size=10000, max_issues=100):
+    """Streams through every transaction ordered by account and id, checking the invariants the
+    Account classes enforce when transactions are added. The database is only read; one without
+    the period close tables, which has never been archived, is checked as well.
+
+    Each check is a single query that stays open while its rows are streamed, so on a live
+    database that is not in WAL mode writers wait for it; check a snapshot copy instead.
+
+    Args:
+        engine (Engine): engine for the bank database
+        chunk_size (int): number of rows fetched per query
+        max_issues (int): number of offending rows kept in the report; all are counted
+
+    Returns:
+        ReconciliationReport: counts and sample of every issue found
+    """
+    transactions = Transaction.__table__
+    accounts = Account.__table__
+    closes = PeriodClose.__table__
+    report = ReconciliationReport(max_issues)
+
+    with engine.connect() as connection:
+        orphans = (select(transactions.c._id, transactions.c._account_id, transactions.c._date)
+                   .select_from(transactions.outerjoin(accounts, transactions.c._account_id == accounts.c._account_number))
+                   .where(accounts.c._account_number.is_(None))
+                   .order_by(transactions.c._id))
+        for row in _stream(connection, orphans, chunk_size):
+            report.transactions += 1
+            report.add(Issue(ORPHANED, row._account_id, row._id, row._date, "no matching account"))
+
+        joined = transactions.join(accounts, transactions.c._account_id == accounts.c._account_number)
+        if inspect(connection).has_table(closes.name):
+            joined = joined.outerjoin(closes, and_(closes.c._opening_id == transactions.c._id,
+                                                   closes.c._account_id == transactions.c._account_id))
+            opening = closes.c._id.is_not(None)
+        else:
+            # never archived, so there are no opening entries
+            opening = false()
+        rows = (select(transactions.c._id, transactions.c._account_id, transactions.c._amt,
+                       transactions.c._date, transactions.c._exempt,
+                       accounts.c._daily_limit, accounts.c._monthly_limit,
+                       accounts.c._balance_threshold, accounts.c._low_balance_fee,
+                       opening.label("_opening"))
+                .select_from(joined)
+                .order_by(transactions.c._account_id, transactions.c._id))
+
+        state = None
+        for row in _stream(connection, rows, chunk_size):
+            if state is None or state.account_number != row._account_id:
+                state = _AccountState(row)
+                report.accounts += 1
+            report.transactions += 1
+            state.check(row, report)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the bank database for ledger inconsistencies.")
+    parser.add_argument("--db", default="bank.db", help="path to the SQLite database")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="rows fetched per query")
+    parser.add_argument("--max-issues", type=int, default=100, help="offending rows listed in the report")
+    parser.add_argument("--snapshot", action="store_true", help="check a fresh point-in-time copy instead of the live file")
+    args = parser.parse_args()
+
+    if args.snapshot:
+        replica = SnapshotReplica(args.db)
+        replica.refresh()
+        engine = replica.engine
+    else:
+        # read-only, so checking never changes the file
+        engine = create_engine(f"sqlite:///file:{args.db}?mode=ro&uri=true")
+    report = reconcile(engine, args.chunk_size, args.max_issues)
+    print(report)
+    sys.exit(0 if report.is_clean() else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Seeded load simulator for capacity planning.
+
+Drives the real Bank and Account API against a scratch SQLite database: opens a mix of savings
+and checking accounts, posts random deposits and withdrawals that stay within the savings limits,
+and runs assess_interest_and_fees for every account at the end of each simulated month. A
+configurable fraction of the attempts deliberately go over a savings limit.
+Reports attempts, accepted postings, throughput and latency of accepted postings, database size
+and rejection rates per month.
+
+Usage: python simulate.py [--accounts N] [--years N] [--activity N] [--limit-violations F] [--seed N] [--db PATH]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from calendar import monthrange
+from datetime import date
+from decimal import Decimal, setcontext, BasicContext
+
+from sqlalchemy.orm.session import sessionmaker
+
+from db import dataBase, create_bank_engine
+from bank import Bank, SAVINGS, CHECKING
+from exceptions import OverdrawError, TransactionLimitError, TransactionSequenceError
+
+# context with ROUND_HALF_UP, as in the front-ends
+setcontext(BasicContext)
+
+CENT = Decimal("0.01")
+
+
+def percentile(values, p):
+    "Nearest-rank percentile of an unsorted list"
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+
+class MonthStats:
+    """Measurements for one simulated month."""
+
+    def __init__(self, year, month):
+        self.year = year
+        self.month = month
+        # latencies of accepted postings only; rejected attempts are just counted
+        self.latencies = []
+        self.attempts = 0
+        self.overdrawn = 0
+        self.limited = 0
+        self.out_of_sequence = 0
+        self.elapsed = 0.0
+        self.db_size = 0
+
+    @property
+    def postings(self):
+        return len(self.latencies)
+
+    def __str__(self):
+        attempts = self.attempts or 1
+        return (f"{self.year}-{self.month:02}  {self.attempts:>8,}  {self.postings:>8,}"
+                f"  {self.postings / self.elapsed if self.elapsed else 0:>9,.0f}"
+                f"  {percentile(self.latencies, 50) * 1000:>8.2f}  {percentile(self.latencies, 99) * 1000:>8.2f}"
+                f"  {self.db_size / 1024:>10,.0f}  {self.overdrawn / attempts:>8.2%}  {self.limited / attempts:>8.2%}")
+
+
+HEADER = (f"{'month':<7}  {'attempts':>8}  {'postings':>8}  {'posts/s':>9}  {'p50 ms':>8}  {'p99 ms':>8}"
+          f"  {'db KiB':>10}  {'overdraw':>8}  {'limit':>8}")
+
+
+class Simulator:
+    """Generates a month of traffic at a time from a seeded random source and posts it through the Bank API."""
+
+    def __init__(self, session, db_path, accounts, activity, seed, limit_violations=0.0):
+        """
+        Args:
+            limit_violations (float, optional): fraction of each month's attempts that go over a savings limit
+        """
+        self._session = session
+        self._db_path = db_path
+        self._activity = activity
+        self._limit_violations = limit_violations
+        self._rng = random.Random(seed)
+
+        self._bank = Bank()
+        self._session.add(self._bank)
+        for _ in range(accounts):
+            self._bank.add_account(self._rng.choice([SAVINGS, CHECKING]), self._session)
+        self._session.commit()
+
+        self._accounts = list(self._bank.show_accounts())
+        # the simulator's own view of each balance, used to size withdrawals
+        self._balances = {a.account_number: Decimal(0) for a in self._accounts}
+
+    def _events(self, year, month):
+        "Returns (date, account, over limit) attempts for a month, sorted by date"
+        days = monthrange(year, month)[1]
+        events = []
+        savings = {}
+        for account in self._accounts:
+            count = self._rng.randint(0, 2 * self._activity)
+            per_day = {}
+            if account._account_type == SAVINGS:
+                count = min(count, int(account._monthly_limit))
+                savings[account] = per_day
+            for _ in range(count):
+                day = self._rng.randint(1, days)
+                if account._account_type == SAVINGS and per_day.get(day, 0) >= account._daily_limit:
+                    continue
+                per_day[day] = per_day.get(day, 0) + 1
+                events.append((date(year, month, day), account, False))
+
+        # keep posting to one savings account on one day until an attempt is over its daily or
+        # monthly limit, until those attempts are the requested fraction of the month's attempts
+        violations = 0
+        while savings and violations < self._limit_violations * len(events):
+            account = self._rng.choice(list(savings))
+            per_day = savings[account]
+            day = self._rng.randint(1, days)
+            while True:
+                over = per_day.get(day, 0) >= account._daily_limit or sum(per_day.values()) >= account._monthly_limit
+                events.append((date(year, month, day), account, over))
+                if over:
+                    violations += 1
+                    break
+                per_day[day] = per_day.get(day, 0) + 1
+
+        # stable, so attempts over a limit stay after the postings that filled it
+        events.sort(key=lambda e: (e[0], e[1].account_number))
+        return events
+
+    def _amount(self, account):
+        balance = self._balances[account.account_number]
+        if balance > 0 and self._rng.random() < 0.4:
+            # withdrawals occasionally ask for more than is there
+            return -(balance * Decimal(self._rng.uniform(0.05, 1.1))).quantize(CENT)
+        return Decimal(self._rng.randint(100, 50000)) / 100
+
+    def run_month(self, year, month):
+        stats = MonthStats(year, month)
+        start = time.perf_counter()
+
+        current_day = None
+        for day, account, over_limit in self._events(year, month):
+            if day != current_day:
+                # one commit per simulated day, as a front-end batching its writes would
+                self._session.commit()
+                current_day = day
+
+            # attempts over a limit deposit, so the balance check cannot reject them first
+            amount = Decimal(self._rng.randint(100, 50000)) / 100 if over_limit else self._amount(account)
+            stats.attempts += 1
+            posted = time.perf_counter()
+            try:
+                account.add_transaction(amount, day, self._session)
+            except OverdrawError:
+                stats.overdrawn += 1
+            except TransactionLimitError:
+                stats.limited += 1
+            except TransactionSequenceError:
+                stats.out_of_sequence += 1
+            else:
+                stats.latencies.append(time.perf_counter() - posted)
+                self._balances[account.account_number] += amount
+        self._session.commit()
+
+        for account in self._accounts:
+            try:
+                account.assess_interest_and_fees(self._session)
+            except (TransactionSequenceError, ValueError):
+                # no activity since the last assessment, or no transactions at all
+                continue
+        self._session.commit()
+
+        # interest and fees change balances, so resynchronise the simulator's view
+        for account in self._accounts:
+            self._balances[account.account_number] = account.get_balance()
+
+        stats.elapsed = time.perf_counter() - start
+        stats.db_size = sum(os.path.getsize(p) for p in (self._db_path, self._db_path + "-wal") if os.path.exists(p))
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate multi-year bank traffic against a scratch database.")
+    parser.add_argument("--accounts", type=int, default=1000, help="number of accounts to open")
+    parser.add_argument("--years", type=int, default=3, help="number of years to simulate")
+    parser.add_argument("--activity", type=int, default=3, help="average postings per account per month")
+    parser.add_argument("--limit-violations", type=float, default=0.01,
+                        help="fraction of attempts that go over a savings limit, from 0 up to but excluding 1")
+    parser.add_argument("--start-year", type=int, default=2023)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", help="database file to create; a temporary one is used by default")
+    args = parser.parse_args()
+    if not 0 <= args.limit_violations < 1:
+        parser.error("--limit-violations must be at least 0 and less than 1")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        db_path = args.db or os.path.join(scratch, "simulation.db")
+        if os.path.exists(db_path):
+            parser.error(f"{db_path} already exists")
+
+        engine = create_bank_engine(f"sqlite:///{db_path}")
+        dataBase.metadata.create_all(engine)
+        session = sessionmaker(engine)()
+
+        simulator = Simulator(session, db_path, args.accounts, args.activity, args.seed, args.limit_violations)
+        print(HEADER)
+        months = []
+        for year in range(args.start_year, args.start_year + args.years):
+            for month in range(1, 13):
+                months.append(simulator.run_month(year, month))
+                print(months[-1])
+
+        attempts = sum(m.attempts for m in months)
+        postings = sum(m.postings for m in months)
+        elapsed = sum(m.elapsed for m in months)
+        latencies = [l for m in months for l in m.latencies]
+        print(f"\nTotal: {postings:,} postings of {attempts:,} attempts in {elapsed:,.1f} s "
+              f"({postings / elapsed if elapsed else 0:,.0f}/s), "
+              f"p50 {percentile(latencies, 50) * 1000:.2f} ms, p99 {percentile(latencies, 99) * 1000:.2f} ms")
+
+        session.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm.session import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from cache import AccountCache
+
+
+def enable_wal(path):
+    """Switches a database to write-ahead logging. The setting is stored in the file, so it only
+    needs to be done once; afterwards readers, including snapshot refreshes, never block writers.
+    """
+    with sqlite3.connect(path) as connection:
+        mode = connection.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    logging.debug(f"Journal mode for {path}: {mode}")
+    return mode
+
+
+class SnapshotReplica:
+    """Consistent point-in-time copy of the bank database for reporting.
+
+    The copy is taken with SQLite's online backup API into a temporary file and then moved into
+    place, so sessions opened on the snapshot always see one complete state of the database
+    while writers keep committing to the original file. Account snapshots read from it should
+    go through the replica's own cache, which is cleared on every refresh, e.g.
+    bank.get_snapshots(session, cache=replica.cache).
+    """
+
+    def __init__(self, source_path, snapshot_path=None, interval=None):
+        """
+        Args:
+            source_path (string): path of the live database
+            snapshot_path (string, optional): path of the copy. Defaults to the source path with a -snapshot suffix.
+            interval (float, optional): seconds between automatic refreshes once started
+        """
+        root, ext = os.path.splitext(source_path)
+        self._source_path = source_path
+        self._snapshot_path = snapshot_path or f"{root}-snapshot{ext}"
+        self._interval = interval
+        self._timer = None
+        self._lock = threading.Lock()
+        self.refreshed_at = None
+        self.cache = AccountCache()
+
+        # a new connection per session, so sessions opened after a refresh see the new file
+        self._engine = create_engine(f"sqlite:///file:{self._snapshot_path}?mode=ro&uri=true", poolclass=NullPool)
+        self._Session = sessionmaker(self._engine)
+
+    @property
+    def path(self):
+        return self._snapshot_path
+
+    @property
+    def engine(self):
+        "Read-only engine on the snapshot, for streaming reports that use SQL directly"
+        return self._engine
+
+    def refresh(self):
+        "Copies the live database into the snapshot file"
+        tmp_path = self._snapshot_path + ".tmp"
+        with self._lock:
+            start = time.perf_counter()
+            source = sqlite3.connect(f"file:{self._source_path}?mode=ro", uri=True)
+            target = sqlite3.connect(tmp_path)
+            try:
+                # copy everything in one step so the copy is a single consistent state
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+            os.replace(tmp_path, self._snapshot_path)
+            self.cache.clear()
+            self.refreshed_at = time.time()
+            logging.debug(f"Snapshot of {self._source_path} refreshed in {time.perf_counter() - start:.3f}s")
+
+    def session(self):
+        """Returns a read-only session on the latest snapshot, refreshing first if this replica has not
+        taken one yet. A snapshot file left by an earlier run is never read, since it may be arbitrarily old.
+        The session keeps the copy it first reads from until its transaction ends, even across refreshes.
+        """
+        if self.refreshed_at is None:
+            self.refresh()
+        return self._Session()
+
+    def start(self):
+        "Refreshes now and then every interval seconds on a background thread"
+        self.refresh()
+        self._schedule()
+
+    def _schedule(self):
+        if self._interval:
+            self._timer = threading.Timer(self._interval, self._tick)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _tick(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logging.error(f"Error refreshing snapshot: {e}")
+        self._schedule()
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep a point-in-time copy of the bank database for reporting.")
+    parser.add_argument("--db", default="bank.db", help="path to the live SQLite database")
+    parser.add_argument("--snapshot", help="path of the copy; defaults to bank-snapshot.db next to the database")
+    parser.add_argument("--interval", type=float, default=0, help="seconds between refreshes; 0 refreshes once")
+    parser.add_argument("--wal", action="store_true", help="switch the live database to write-ahead logging first")
+    args = parser.parse_args()
+
+    if args.wal:
+        enable_wal(args.db)
+
+    replica = SnapshotReplica(args.db, args.snapshot, args.interval)
+    replica.refresh()
+    print(f"Snapshot written to {replica.path}")
+
+    while args.interval:
+        time.sleep(args.interval)
+        try:
+            replica.refresh()
+        except sqlite3.Error as e:
+            logging.error(f"Error refreshing snapshot: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from bank import Bank
+from archive import close_period, get_history
+
+
+def _days(start, end):
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+def test_balances_before_a_close_include_archived_transactions(bank, engine, Session):
+    bank, session = bank
+    checking = bank.get_account(2)
+    for month in range(1, 7):
+        checking.add_transaction(Decimal(100 * month), date(2023, month, 3), session)
+        checking.add_transaction(Decimal(-30), date(2023, month, 17), session)
+        session.commit()
+        checking.assess_interest_and_fees(session)
+        session.commit()
+
+    days = list(_days(date(2022, 12, 25), date(2023, 7, 5)))
+    as_of = [checking.get_balance_as_of(day) for day in days]
+    flows = [checking.get_net_flow(date(2023, 1, 10), day) for day in days]
+    history = [str(t) for t in get_history(session, 2)]
+    session.close()
+
+    # the second close archives the opening entry left by the first
+    assert close_period(engine, date(2023, 3, 1))[0] == 1
+    assert close_period(engine, date(2023, 5, 1))[0] == 1
+
+    session = Session()
+    checking = session.query(Bank).first().get_account(2)
+    assert min(t.date for t in checking.get_transactions()) == date(2023, 4, 30)
+    assert [checking.get_balance_as_of(day) for day in days] == as_of
+    assert [checking.get_net_flow(date(2023, 1, 10), day) for day in days] == flows
+    assert [str(t) for t in get_history(session, 2)] == history
+
+    # postings after the close extend the same index
+    checking.add_transaction(Decimal(5), date(2023, 7, 1), session)
+    assert checking.get_balance_as_of(date(2023, 7, 1)) == as_of[-1] + 5
+    assert checking.get_net_flow(date(2023, 2, 1), date(2023, 2, 28)) == flows[days.index(date(2023, 2, 28))] - flows[days.index(date(2023, 1, 31))]
+    session.close()
@@ -0,0 +1,100 @@
+from datetime import date
+from decimal import Decimal
+
+from bank import Bank
+from archive import close_period
+from balance_index import BalanceIndex
+from transactions import Transaction
+
+
+def _t(amt, day, exempt=False):
+    return Transaction(Decimal(amt), 1, date=day, exempt=exempt)
+
+
+def test_empty_index():
+    index = BalanceIndex()
+    assert len(index) == 0
+    assert index.newest is None
+    assert index.balance_as_of(date(2023, 1, 1)) == 0
+    assert index.net_flow(date(2023, 1, 1), date(2023, 12, 31)) == 0
+
+
+def test_net_flow_with_end_before_start():
+    index = BalanceIndex([_t("100", date(2023, 1, 5)), _t("-20", date(2023, 1, 10))])
+    assert index.net_flow(date(2023, 1, 10), date(2023, 1, 5)) == 0
+    assert index.net_flow(date(2023, 1, 5), date(2023, 1, 10)) == 80
+
+
+def test_same_day_entries():
+    day = date(2023, 1, 5)
+    index = BalanceIndex([_t("100", date(2023, 1, 1)), _t("20", day), _t("-5", day), _t("7", day)])
+    assert index.balance_as_of(day - (day - date(2023, 1, 4))) == 100
+    assert index.balance_as_of(day) == 122
+    assert index.net_flow(day, day) == 22
+    assert index.can_append(_t("1", day))
+    assert not index.can_append(_t("1", date(2023, 1, 4)))
+
+
+def test_out_of_order_exempt_posting_rebuilds_the_index(bank):
+    bank, session = bank
+    checking = bank.get_account(2)
+    checking.get_transactions()
+    checking.add_transaction(Decimal("100"), date(2023, 1, 1), session)
+    checking.add_transaction(Decimal("50"), date(2023, 1, 20), session)
+    index = checking._get_balance_index()
+    assert checking.get_balance_as_of(date(2023, 1, 10)) == 100
+
+    # exempt postings skip the sequence check, so they can land before the newest entry
+    checking.add_transaction(Decimal("-5"), date(2023, 1, 5), session, exempt=True)
+    assert checking._get_balance_index() is not index
+    assert checking.get_balance_as_of(date(2023, 1, 10)) == 95
+    assert checking.get_balance_as_of(date(2023, 1, 31)) == 145
+
+
+def test_index_is_kept_across_commits(bank, Session, statements):
+    bank, session = bank
+    checking = bank.get_account(2)
+    for day in range(1, 21):
+        checking.add_transaction(Decimal("10"), date(2023, 1, day), session)
+    session.commit()
+    assert checking.get_balance_as_of(date(2023, 1, 10)) == 100
+    index = checking._balance_index
+
+    # a commit expires the history; the index is checked in one query instead of reloading it
+    checking.add_transaction(Decimal("10"), date(2023, 1, 21), session)
+    session.commit()
+    with statements:
+        assert checking.get_balance_as_of(date(2023, 1, 21)) == 210
+    assert checking._balance_index is index
+    assert not checking._history_loaded()
+    # BEGIN, the account's own expired columns and the check
+    assert statements.count == 3
+
+    # postings stored by another session are appended from the rows after the newest indexed id
+    session.commit()
+    other = Session()
+    other.query(Bank).first().get_account(2).add_transaction(Decimal("5"), date(2023, 1, 22), other)
+    other.commit()
+    other.close()
+    with statements:
+        assert checking.get_balance_as_of(date(2023, 1, 22)) == 215
+    assert checking._balance_index is index
+    # as above, plus the one new row
+    assert statements.count == 4
+
+
+def test_period_close_rebuilds_a_kept_index(bank, engine):
+    bank, session = bank
+    checking = bank.get_account(2)
+    for month in range(1, 5):
+        checking.add_transaction(Decimal("100"), date(2023, month, 3), session)
+        checking.add_transaction(Decimal("-30"), date(2023, month, 17), session)
+    session.commit()
+    days = [date(2023, month, 20) for month in range(1, 5)]
+    as_of = [checking.get_balance_as_of(day) for day in days]
+    index = checking._balance_index
+    session.commit()
+
+    assert close_period(engine, date(2023, 3, 1))[0] == 1
+    assert [checking.get_balance_as_of(day) for day in days] == as_of
+    assert checking._balance_index is not index
@@ -0,0 +1,59 @@
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import insert
+
+from cache import AccountCache
+from transactions import Transaction
+
+
+def _post_elsewhere(engine, account_num, amt):
+    "Adds a transaction the way another process would, without touching this process's cache"
+    with engine.begin() as connection:
+        connection.execute(insert(Transaction.__table__).values(_account_id=account_num, _amt=amt,
+                                                                _date=date(2023, 1, 5), _exempt=False))
+
+
+def test_snapshots_pick_up_postings_from_other_processes(bank, engine):
+    bank, session = bank
+    cache = AccountCache()
+    bank.get_account(2).add_transaction(Decimal("100"), date(2023, 1, 1), session)
+    session.commit()
+
+    assert [s.balance for s in bank.get_snapshots(session, cache=cache)] == [0, 100, 0]
+    assert [s.balance for s in bank.get_snapshots(session, cache=cache)] == [0, 100, 0]
+    assert cache.hits == 3
+    # end the read transaction as the front-ends do, so the other writer is not blocked
+    session.commit()
+
+    _post_elsewhere(engine, 2, 25)
+    _post_elsewhere(engine, 3, 10)
+
+    assert [s.balance for s in bank.get_snapshots(session, cache=cache)] == [0, 125, 10]
+    assert cache.stale == 2
+    assert cache.stats()["size"] == 3
+
+
+def test_single_snapshot_is_checked(bank, engine):
+    bank, session = bank
+    cache = AccountCache()
+    bank.get_account(2).add_transaction(Decimal("100"), date(2023, 1, 1), session)
+    session.commit()
+
+    assert bank.get_snapshot(2, cache=cache).balance == 100
+    assert bank.get_snapshot(2, cache=cache).balance == 100
+    session.commit()
+    _post_elsewhere(engine, 2, -40)
+
+    snapshot = bank.get_snapshot(2, cache=cache)
+    assert snapshot.balance == 60
+    assert snapshot.last_date == date(2023, 1, 5)
+    assert (cache.hits, cache.stale) == (1, 1)
+
+
+def test_snapshot_pages(bank):
+    bank, session = bank
+    first = bank.get_snapshots(session, limit=2)
+    rest = bank.get_snapshots(session, after=first[-1].account_number, limit=2)
+    assert [s.account_number for s in first] == [1, 2]
+    assert [s.account_number for s in rest] == [3]
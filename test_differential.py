@@ -0,0 +1,9 @@
+import pytest
+
+from differential import check
+
+
+@pytest.mark.parametrize("persisted", [False, True], ids=["memory", "database"])
+def test_production_matches_reference(persisted):
+    mismatches = [(seed, mismatch) for seed in range(300) if (mismatch := check(seed, 40, persisted))]
+    assert mismatches == []
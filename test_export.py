@@ -0,0 +1,58 @@
+import csv
+import json
+import os
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from archive import close_period
+from export import export, STATE_FILE
+
+
+def _rows(out_dir, run):
+    rows = []
+    for name in sorted(os.listdir(out_dir)):
+        if name.startswith(f"transactions-{run:06}-"):
+            with open(os.path.join(out_dir, name), newline="") as f:
+                rows.extend(csv.DictReader(f))
+    return rows
+
+
+def test_incremental_export_refuses_after_a_close(bank, engine, tmp_path):
+    bank, session = bank
+    db_path = engine.url.database
+    out_dir = str(tmp_path / "out")
+    checking = bank.get_account(2)
+    for month in (1, 2, 3):
+        checking.add_transaction(Decimal(100), date(2023, month, 5), session)
+    session.commit()
+
+    assert export(db_path, out_dir, shards=2, fmt="csv")["_transactions"] == 3
+    checking.add_transaction(Decimal(7), date(2023, 3, 6), session)
+    session.commit()
+    assert export(db_path, out_dir, shards=2, fmt="csv", incremental=True)["_transactions"] == 1
+    assert [row["amt"] for row in _rows(out_dir, 2)] == ["7.0"]
+
+    close_period(engine, date(2023, 3, 1))
+    with pytest.raises(ValueError):
+        export(db_path, out_dir, shards=2, fmt="csv", incremental=True)
+
+    # a full export picks up the opening entry and lets incremental exports continue
+    assert export(db_path, out_dir, shards=2, fmt="csv")["_transactions"] == 3
+    with open(os.path.join(out_dir, STATE_FILE)) as f:
+        state = json.load(f)
+    assert (state["run"], state["_period_closes"]) == (3, 1)
+    assert export(db_path, out_dir, shards=2, fmt="csv", incremental=True)["_transactions"] == 0
+
+
+def test_runs_never_overwrite_each_other(bank, engine, tmp_path):
+    bank, session = bank
+    bank.get_account(2).add_transaction(Decimal(100), date(2023, 1, 5), session)
+    session.commit()
+    out_dir = str(tmp_path / "out")
+
+    export(engine.url.database, out_dir, shards=1, fmt="csv")
+    export(engine.url.database, out_dir, shards=1, fmt="csv")
+
+    assert len(_rows(out_dir, 1)) == len(_rows(out_dir, 2)) == 1
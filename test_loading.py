@@ -0,0 +1,117 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal, localcontext, BasicContext
+
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+
+from bank import Bank, SAVINGS, CHECKING
+from exceptions import TransactionSequenceError
+
+
+def _bank_with_history(Session, accounts, postings):
+    "Commits a bank of checking accounts with the given number of postings each, returning a fresh session"
+    session = Session()
+    bank = Bank()
+    session.add(bank)
+    for _ in range(accounts):
+        bank.add_account(CHECKING, session)
+    session.commit()
+    for account in bank.show_accounts():
+        for i in range(postings):
+            account.add_transaction(Decimal("10"), date(2023, 1, 1) + timedelta(days=i), session)
+    session.commit()
+    session.close()
+
+    session = Session()
+    return session.query(Bank).first(), session
+
+
+@pytest.mark.parametrize("postings", [3, 60])
+def test_posting_does_not_load_history(Session, statements, postings):
+    bank, session = _bank_with_history(Session, 1, postings)
+
+    with statements:
+        account = bank.get_account(1)
+        account.add_transaction(Decimal("-5"), date(2023, 6, 1), session)
+        session.commit()
+    # account lookup, balance, latest date and the insert, however long the history is
+    assert statements.count <= 4
+
+    account = bank.get_account(1)
+    with pytest.raises(InvalidRequestError):
+        account._transactions
+    assert account.get_balance() == 10 * postings - 5
+
+
+@pytest.mark.parametrize("accounts", [2, 20])
+def test_summary_statements_do_not_grow_with_accounts(Session, statements, accounts):
+    bank, session = _bank_with_history(Session, accounts, 5)
+
+    with statements:
+        snapshots = bank.get_snapshots(session)
+    # account numbers, totals and the accounts themselves
+    assert statements.count == 3
+    assert [s.balance for s in snapshots] == [50] * accounts
+    assert {s.last_date for s in snapshots} == {date(2023, 1, 5)}
+
+
+def test_history_loads_once_when_needed(Session, statements):
+    bank, session = _bank_with_history(Session, 1, 30)
+    account = bank.get_account(1)
+
+    with statements:
+        transactions = account.get_transactions()
+        account.get_balance_as_of(date(2023, 1, 10))
+        account.get_balance()
+    # the history, and the period closes that decide whether archived transactions are needed
+    assert statements.count == 2
+    assert len(transactions) == 30
+    assert account.get_balance_as_of(date(2023, 1, 10)) == 100
+
+
+def test_assessment_without_history(Session):
+    bank, session = _bank_with_history(Session, 1, 2)
+    account = bank.get_account(1)
+
+    account.assess_interest_and_fees(session)
+    session.commit()
+
+    account = bank.get_account(1)
+    transactions = account.get_transactions()
+    assert [t.date for t in transactions[-2:]] == [date(2023, 1, 31)] * 2
+    assert transactions[-1].amount == Decimal("-5.44")
+
+    account = bank.get_account(1)
+    with pytest.raises(TransactionSequenceError):
+        account.assess_interest_and_fees(session)
+
+
+def test_balance_is_the_same_with_or_without_history(Session):
+    session = Session()
+    bank = Bank()
+    session.add(bank)
+    for i in range(40):
+        bank.add_account(SAVINGS if i % 2 else CHECKING, session)
+    session.commit()
+
+    # interest at the BasicContext precision leaves amounts whose float sum rounds differently
+    with localcontext(BasicContext):
+        for account in bank.show_accounts():
+            rng = random.Random(account.account_number)
+            for month in range(1, 13):
+                for day in (3, 17):
+                    account.add_transaction(Decimal(rng.randint(1, 300000)) / 100, date(2022, month, day), session)
+                account.assess_interest_and_fees(session)
+                session.commit()
+        session.close()
+
+        session = Session()
+        bank = session.query(Bank).first()
+        snapshots = bank.get_snapshots(session)
+        for snapshot in snapshots:
+            account = bank.get_account(snapshot.account_number)
+            from_database = account.get_balance()
+            account.get_transactions()
+            assert account.get_balance() == from_database == snapshot.balance
+    session.close()
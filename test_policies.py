@@ -0,0 +1,102 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+import policies
+from policies import register_product, load_products, load_configured_products, compile_policy, PRODUCTS_ENV
+from exceptions import TransactionLimitError
+
+
+@pytest.fixture(autouse=True)
+def restore_products():
+    "Keeps products registered by a test from leaking into the others"
+    saved = dict(policies._products)
+    yield
+    policies._products.clear()
+    policies._products.update(saved)
+
+
+def _open(bank, session, product):
+    bank.add_account(product, session)
+    session.commit()
+    return bank.get_account(len(bank._accounts))
+
+
+def test_custom_product_limits(bank):
+    bank, session = bank
+    register_product("premium", {"kind": "savings", "interest_rate": "0.01", "daily_limit": 1, "monthly_limit": 2})
+    account = _open(bank, session, "premium")
+
+    account.add_transaction(Decimal("100"), date(2023, 1, 1), session)
+    with pytest.raises(TransactionLimitError) as ex:
+        account.add_transaction(Decimal("10"), date(2023, 1, 1), session)
+    assert (ex.value.limit_type, ex.value.limit) == ("day", 1)
+
+    account.add_transaction(Decimal("10"), date(2023, 1, 2), session)
+    with pytest.raises(TransactionLimitError) as ex:
+        account.add_transaction(Decimal("10"), date(2023, 1, 3), session)
+    assert (ex.value.limit_type, ex.value.limit) == ("month", 2)
+
+
+def test_custom_product_fee_and_interest(bank):
+    bank, session = bank
+    register_product("basic", {"kind": "checking", "interest_rate": "0.01",
+                               "balance_threshold": 500, "low_balance_fee": "-10"})
+    account = _open(bank, session, "basic")
+
+    account.add_transaction(Decimal("200"), date(2023, 1, 5), session)
+    account.assess_interest_and_fees(session)
+    session.commit()
+
+    # 200 earns 2.00 interest, then the balance is still under 500 so the fee is charged
+    assert [t.amount for t in account.get_transactions()] == [Decimal("200"), Decimal("2.00"), Decimal("-10")]
+    assert account.get_balance() == Decimal("192.00")
+
+
+def test_rules_that_cannot_apply_compile_to_no_ops():
+    policy = compile_policy(Decimal("0.01"), float("inf"), None, None, Decimal("-5"))
+    assert policy.check_limits is policies._no_limits
+    assert policy.assess_fees is policies._no_fees
+
+    policy = compile_policy(Decimal("0.01"), 3, None, 100, Decimal("-5"))
+    assert policy.check_limits is not policies._no_limits
+    assert policy.assess_fees is not policies._no_fees
+
+
+@pytest.mark.parametrize("definition", [
+    {"kind": "savings"},
+    {"kind": "brokerage", "interest_rate": "0.01"},
+    {"kind": "savings", "interest_rate": "0.01", "overdraft": True},
+    {"kind": "savings", "interest_rate": "lots"},
+    {"kind": "savings", "interest_rate": None},
+    {"kind": "savings", "interest_rate": "0.01", "daily_limit": 0},
+    {"kind": "savings", "interest_rate": "0.01", "monthly_limit": "5"},
+    {"kind": "savings", "interest_rate": "0.01", "daily_limit": True},
+    {"kind": "checking", "interest_rate": "0.01", "low_balance_fee": "-5"},
+    {"kind": "checking", "interest_rate": "0.01", "balance_threshold": "100", "low_balance_fee": "-5"},
+    {"kind": "checking", "interest_rate": "0.01", "balance_threshold": 100, "low_balance_fee": "five"},
+])
+def test_invalid_definitions_are_rejected(definition):
+    with pytest.raises(ValueError):
+        register_product("bad", definition)
+    assert policies.get_product("bad") is None
+
+
+def test_bad_product_file_registers_nothing(tmp_path):
+    path = tmp_path / "products.json"
+    path.write_text(json.dumps({"good": {"kind": "savings", "interest_rate": 0.02},
+                                "bad": {"kind": "savings"}}))
+    with pytest.raises(ValueError):
+        load_products(path)
+    assert policies.get_product("good") is None
+
+
+def test_products_load_from_environment(tmp_path, monkeypatch):
+    path = tmp_path / "products.json"
+    path.write_text(json.dumps({"student": {"kind": "checking", "interest_rate": "0", "monthly_limit": 10}}))
+    monkeypatch.setenv(PRODUCTS_ENV, str(path))
+    load_configured_products()
+    assert policies.get_product("student")["monthly_limit"] == 10
+    assert "student" in policies.product_names()
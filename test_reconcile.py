@@ -0,0 +1,46 @@
+from datetime import date
+
+from sqlalchemy import create_engine, insert, inspect
+
+from db import dataBase
+from accounts import Account
+from transactions import Transaction
+from archive import PeriodClose, ArchivedTransaction
+from reconcile import reconcile, OVERDRAW, ORPHANED
+
+
+def _ledger(path, with_archive):
+    engine = create_engine(f"sqlite:///{path}")
+    tables = [t for t in dataBase.metadata.sorted_tables
+              if with_archive or t.name not in (PeriodClose.__tablename__, ArchivedTransaction.__tablename__)]
+    dataBase.metadata.create_all(engine, tables=tables)
+    with engine.begin() as connection:
+        connection.execute(insert(Account.__table__).values(_account_number=1, _account_type="checking"))
+        connection.execute(insert(Transaction.__table__), [
+            {"_account_id": 1, "_amt": 50, "_date": date(2023, 1, 1), "_exempt": False},
+            {"_account_id": 1, "_amt": -80, "_date": date(2023, 1, 2), "_exempt": False},
+            {"_account_id": 7, "_amt": 10, "_date": date(2023, 1, 3), "_exempt": False},
+        ])
+    return engine
+
+
+def test_reconcile_without_archive_tables(tmp_path):
+    engine = _ledger(tmp_path / "bank.db", with_archive=False)
+
+    report = reconcile(engine, chunk_size=1)
+
+    assert report.counts == {OVERDRAW: 1, ORPHANED: 1}
+    assert report.transactions == 3
+    assert not inspect(engine).has_table(PeriodClose.__tablename__)
+
+
+def test_reconcile_reads_in_account_order(tmp_path):
+    engine = _ledger(tmp_path / "bank.db", with_archive=True)
+    with engine.connect() as connection:
+        plan = " ".join(str(row[-1]) for row in connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT _id FROM _transactions ORDER BY _account_id, _id"))
+    # the composite index provides the order, so no temporary sort is needed
+    assert "ix__transactions__account_id__id" in plan
+    assert "TEMP B-TREE" not in plan
+
+    assert reconcile(engine).counts == {OVERDRAW: 1, ORPHANED: 1}
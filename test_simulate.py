@@ -0,0 +1,23 @@
+from simulate import Simulator
+
+
+def test_attempts_and_accepted_postings_are_counted_separately(Session, tmp_path):
+    session = Session()
+    simulator = Simulator(session, str(tmp_path / "bank.db"), 30, 3, seed=1, limit_violations=0.1)
+
+    stats = [simulator.run_month(2023, month) for month in (1, 2)]
+
+    for month in stats:
+        rejected = month.overdrawn + month.limited + month.out_of_sequence
+        assert month.attempts == month.postings + rejected
+        assert month.limited > 0
+    assert 0.05 < sum(m.limited for m in stats) / sum(m.attempts for m in stats) < 0.15
+    session.close()
+
+
+def test_no_limit_violations_by_request(Session, tmp_path):
+    session = Session()
+    simulator = Simulator(session, str(tmp_path / "bank.db"), 30, 3, seed=1)
+
+    assert simulator.run_month(2023, 1).limited == 0
+    session.close()
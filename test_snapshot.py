@@ -0,0 +1,73 @@
+import shutil
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select, func
+
+from bank import Bank
+from snapshot import SnapshotReplica
+from transactions import Transaction
+
+
+@pytest.fixture
+def replica(engine):
+    replica = SnapshotReplica(engine.url.database)
+    yield replica
+    replica.stop()
+    replica.engine.dispose()
+
+
+def _count(session):
+    return session.scalar(select(func.count()).select_from(Transaction))
+
+
+def _post(bank, session, amount, day):
+    bank.get_account(2).add_transaction(Decimal(amount), date(2023, 1, day), session)
+    session.commit()
+
+
+def test_first_session_refreshes_over_an_old_snapshot_file(bank, replica):
+    bank, session = bank
+    shutil.copy(replica._source_path, replica.path)
+    _post(bank, session, "100", 1)
+
+    reader = replica.session()
+    assert replica.refreshed_at is not None
+    assert _count(reader) == 1
+    reader.close()
+
+
+def test_refresh_picks_up_new_commits(bank, replica):
+    bank, session = bank
+    _post(bank, session, "100", 1)
+    reader = replica.session()
+    report = reader.query(Bank).first()
+    assert report.get_snapshots(reader, cache=replica.cache)[1].balance == 100
+    reader.close()
+
+    _post(bank, session, "50", 2)
+    replica.refresh()
+    assert replica.cache.stats()["size"] == 0
+
+    reader = replica.session()
+    report = reader.query(Bank).first()
+    assert report.get_snapshots(reader, cache=replica.cache)[1].balance == 150
+    assert _count(reader) == 2
+    reader.close()
+
+
+def test_open_session_keeps_its_point_in_time_view(bank, replica):
+    bank, session = bank
+    _post(bank, session, "100", 1)
+    reader = replica.session()
+    assert _count(reader) == 1
+
+    _post(bank, session, "50", 2)
+    replica.refresh()
+
+    # the open session still reads the copy it started on, until its transaction ends
+    assert _count(reader) == 1
+    reader.commit()
+    assert _count(reader) == 2
+    reader.close()
@@ -0,0 +1,94 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select, func
+
+from transactions import Transaction
+from bank import _lock_for
+from exceptions import OverdrawError, TransactionLimitError, AccountNotFoundError
+
+
+def _rows(session):
+    return session.execute(select(Transaction._account_id, Transaction._amt).order_by(Transaction._id)).all()
+
+
+def test_transfer_posts_both_legs(bank):
+    bank, session = bank
+    bank.get_account(2).add_transaction(Decimal("100"), date(2023, 1, 1), session)
+    session.commit()
+
+    bank.transfer(2, 3, Decimal("40"), date(2023, 1, 2), session)
+    session.commit()
+
+    assert bank.get_account(2).get_balance() == 60
+    assert bank.get_account(3).get_balance() == 40
+
+
+def test_rejected_batch_leaves_no_rows(bank, Session):
+    bank, session = bank
+    d = date(2023, 1, 2)
+    bank.get_account(1).add_transaction(Decimal("100"), date(2023, 1, 1), session)
+    bank.get_account(1).add_transaction(Decimal("100"), d, session)
+    session.commit()
+    before = _rows(session)
+
+    # touching the accounts first means the second leg's lazy loads autoflush the first legs
+    bank.show_accounts()
+    with pytest.raises(TransactionLimitError):
+        bank.transfer_batch([(1, 3, Decimal("10"), d), (1, 2, Decimal("30"), d)], session)
+    session.commit()
+
+    assert _rows(session) == before
+    assert bank.get_account(1).get_balance() == 200
+    assert bank.get_account(1).get_balance_as_of(d) == 200
+    assert bank.get_account(3).get_balance() == 0
+
+    other = Session()
+    assert other.execute(select(func.count()).select_from(Transaction)).scalar() == 2
+    other.close()
+
+
+def test_overdrawn_transfer_leaves_no_rows(bank):
+    bank, session = bank
+    bank.get_account(2).add_transaction(Decimal("10"), date(2023, 1, 1), session)
+    session.commit()
+
+    with pytest.raises(OverdrawError):
+        bank.transfer_batch([(2, 3, Decimal("5"), date(2023, 1, 2)), (2, 3, Decimal("50"), date(2023, 1, 2))], session)
+    session.commit()
+
+    assert _rows(session) == [(2, Decimal("10"))]
+
+
+def test_unknown_account(bank):
+    bank, session = bank
+    with pytest.raises(AccountNotFoundError):
+        bank.transfer(2, 99, Decimal("1"), date(2023, 1, 1), session)
+
+
+def test_rolled_back_transfer_leaves_no_rows(bank, Session):
+    bank, session = bank
+    bank.get_account(2).add_transaction(Decimal("100"), date(2023, 1, 1), session)
+    session.commit()
+
+    bank.transfer(2, 3, Decimal("40"), date(2023, 1, 2), session)
+    session.rollback()
+
+    other = Session()
+    assert _rows(other) == [(2, Decimal("100"))]
+    other.close()
+
+
+def test_locks_released_when_savepoint_fails(bank, monkeypatch):
+    bank, session = bank
+
+    def fail():
+        raise RuntimeError("no savepoint")
+    monkeypatch.setattr(session, "begin_nested", fail)
+
+    with pytest.raises(RuntimeError):
+        bank.transfer(2, 3, Decimal("1"), date(2023, 1, 1), session)
+    for num in (2, 3):
+        assert _lock_for(num).acquire(blocking=False)
+        _lock_for(num).release()
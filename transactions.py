@@ -1,35 +1,13 @@
 from db import dataBase
-from sqlalchemy import Column, Integer, Float, ForeignKey, Boolean, Date
+from sqlalchemy import Column, Integer, Float, ForeignKey, Boolean, Date, Index
 from sqlalchemy.orm import relationship
 
 from datetime import date, timedelta
 import logging
 
 
-class Transaction(dataBase):
-
-    __tablename__ = "_transactions"
-    account = relationship("Account", back_populates="_transactions")
-
-    _id = Column(Integer, primary_key=True)
-    _account_id = Column(Integer, ForeignKey("_accounts._account_number"))
-    _amt = Column(Float)
-    _date = Column(Date)
-    _exempt = Column(Boolean)
-    
-
-    def __init__(self, amt, acct_num, date, exempt=False):
-        """
-        Args:
-            amt (Decimal): Decimal object representing dollar amount of the transaction.
-            acct_num (int): Account number used for logging the transaction's creation.
-            date (Date): Date object representing the date the transaction was created.
-            exempt (bool, optional): Determines whether the transaction is exempt from account limits. Defaults to False.
-        """       
-        self._amt = amt
-        self._date = date
-        self._exempt = exempt
-        logging.debug(f"Created transaction: {acct_num}, {self._amt}")
+class TransactionMixin:
+    """Accessors, formatting and ordering shared by live and archived transactions."""
 
     @property
     def date(self):
@@ -53,6 +31,49 @@ class Transaction(dataBase):
         "Check if the transaction is exempt from account limits"
         return self._exempt
 
+    def __lt__(self, value):
+        "Compares Transactions by date"
+
+        # Note that I did not include the ComparableMixin here.
+        # It is not needed since only less than is used currently.
+        # More importantly, it makes sense to do this comparison by date, 
+        # but if we base all the others off of this, including __eq__, 
+        # then we could run into a bug down the road where all transactions 
+        # on the same date are treated as equal. This probably isn't what 
+        # you would want to happen, so it's better to manually write another 
+        # __eq__ method as needed that can also check the amount, or some other 
+        # identifier to make transactions unique.
+        return self._date < value._date
+
+
+class Transaction(TransactionMixin, dataBase):
+
+    __tablename__ = "_transactions"
+    # an account's transactions in id order: loading a history, the newest id, and the
+    # account-ordered scans of reconcile.py all walk this index instead of the whole table
+    __table_args__ = (Index("ix__transactions__account_id__id", "_account_id", "_id"),)
+    account = relationship("Account", back_populates="_transactions")
+
+    _id = Column(Integer, primary_key=True)
+    _account_id = Column(Integer, ForeignKey("_accounts._account_number"))
+    _amt = Column(Float(asdecimal=True))
+    _date = Column(Date)
+    _exempt = Column(Boolean)
+    
+
+    def __init__(self, amt, acct_num, date, exempt=False):
+        """
+        Args:
+            amt (Decimal): Decimal object representing dollar amount of the transaction.
+            acct_num (int): Account number used for logging the transaction's creation.
+            date (Date): Date object representing the date the transaction was created.
+            exempt (bool, optional): Determines whether the transaction is exempt from account limits. Defaults to False.
+        """       
+        self._amt = amt
+        self._date = date
+        self._exempt = exempt
+        logging.debug(f"Created transaction: {acct_num}, {self._amt}")
+
     def in_same_day(self, other):
         "Takes in a date object and checks whether this transaction shares the same date"
         return self._date == other._date
@@ -71,20 +92,6 @@ class Transaction(dataBase):
         "Takes in an amount and checks whether this transaction would withdraw more than that amount"
         return self._amt >= 0 or balance >= abs(self._amt)
 
-    def __lt__(self, value):
-        "Compares Transactions by date"
-
-        # Note that I did not include the ComparableMixin here.
-        # It is not needed since only less than is used currently.
-        # More importantly, it makes sense to do this comparison by date, 
-        # but if we base all the others off of this, including __eq__, 
-        # then we could run into a bug down the road where all transactions 
-        # on the same date are treated as equal. This probably isn't what 
-        # you would want to happen, so it's better to manually write another 
-        # __eq__ method as needed that can also check the amount, or some other 
-        # identifier to make transactions unique.
-        return self._date < value._date
-
     def last_day_of_month(self):
         "Returns a date corresponding to the last day in the same month as this transaction"
 
@@ -95,3 +102,34 @@ class Transaction(dataBase):
         # Then subtracts one day
         return first_of_next_month - timedelta(days=1)
 
+
+
+class PeriodClose(dataBase):
+    """Record of one account's transactions before a cutoff being moved to the archive, see archive.py."""
+
+    __tablename__ = "_period_closes"
+
+    _id = Column(Integer, primary_key=True)
+    _account_id = Column(Integer, ForeignKey("_accounts._account_number"))
+    _cutoff = Column(Date)
+    # id of the carried-forward opening balance transaction left in _transactions
+    _opening_id = Column(Integer, index=True)
+    _archived = Column(Integer)
+    _closed_on = Column(Date)
+
+
+class ArchivedTransaction(TransactionMixin, dataBase):
+    """A transaction moved out of _transactions by a period close."""
+
+    __tablename__ = "_archived_transactions"
+
+    _archive_id = Column(Integer, primary_key=True)
+    # id the transaction had in _transactions
+    _id = Column(Integer, index=True)
+    _close_id = Column(Integer, ForeignKey("_period_closes._id"))
+    _account_id = Column(Integer, ForeignKey("_accounts._account_number"), index=True)
+    _amt = Column(Float(asdecimal=True))
+    _date = Column(Date)
+    _exempt = Column(Boolean)
+    # true for an opening balance entry from an earlier close, rather than a real transaction
+    _carried_forward = Column(Boolean, default=False)